@@ -1,11 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database.config import get_settings
-from database.database import init_db
+from database.database import init_db, async_engine
 from routes.home import home_route
 from routes.user import user_route
 from routes.prediction import prediction_route
 from routes.ml import ml_route
+from routes.metrics import metrics_route
+from services.rm import close_publisher
+from services.metrics import MetricsMiddleware
+from services import password_hasher
+from services.task_events import get_task_event_hub
+from services.admission import get_admission_controller
+from services import inline_recommender
+from services import result_renderer
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 import logging
 
@@ -30,8 +39,10 @@ def create_application() -> FastAPI:
     allow_methods=["*"],
     allow_headers=["*"],
 )
+    app.add_middleware(MetricsMiddleware)
 
     app.include_router(home_route, tags=['Home']) 
+    app.include_router(metrics_route, tags=['Metrics'])
     app.include_router(user_route, prefix='/api/users', tags=['Users']) 
     app.include_router(prediction_route, prefix='/api/predictions', tags=['Predictions'])
     app.include_router(ml_route, prefix='/api/ml', tags=['ML'])
@@ -50,9 +61,22 @@ def on_startup():
         logger.error(f"Startup FAILED: {str(e)}")
         raise
 
+@app.on_event("startup")
+async def start_task_events():
+    # Контроль допуска подписывается на события до подключения слушателя
+    get_admission_controller()
+    await get_task_event_hub().start()
+    inline_recommender.start_loading()
+    # Сборка артефакта каталога (если нужна) — вне event loop
+    await run_in_threadpool(result_renderer.warm_up)
+
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info('Application shutting down...')
+    await get_task_event_hub().stop()
+    close_publisher()
+    password_hasher.shutdown()
+    await async_engine.dispose()
 
 if __name__ == '__main__':
     uvicorn.run(
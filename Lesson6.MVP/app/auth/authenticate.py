@@ -1,24 +1,36 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from services.user_service import UserService, User
-from database.database import get_session
+from services.user_service import AsyncUserService, User
+from database.database import get_async_session
 from auth.jwt_handler import verify_access_token
+from auth.user_cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/signin")
 
-async def authenticate(token: str = Depends(oauth2_scheme)) -> str:
+async def token_payload(token: str = Depends(oauth2_scheme)) -> dict:
 
-    payload = verify_access_token(token)
-    return payload["user"]  
+    return verify_access_token(token)
 
-async def get_current_user(email: str = Depends(authenticate), session=Depends(get_session)) -> User:
+async def get_current_user(payload: dict = Depends(token_payload), session=Depends(get_async_session)) -> User:
 
-    user_service = UserService(session)
-    user = user_service.get_by_email(email)
+    # Частый путь: id из токена и пользователь в кэше — без SQL
+    # (сессия не берёт соединение из пула, пока к ней не обратились)
+    user_id = payload.get("uid")
+    if user_id is not None:
+        user = user_cache.get(user_id)
+        if user:
+            return user
+
+    user_service = AsyncUserService(session)
+    if user_id is not None:
+        user = await user_service.get_by_id(user_id)
+    else:
+        # Токены, выданные до появления uid
+        user = await user_service.get_by_email(payload["user"])
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден"
         )
+    user_cache.put(user)
     return user
-
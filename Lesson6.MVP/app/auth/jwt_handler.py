@@ -1,4 +1,5 @@
 import time
+from typing import Optional
 from datetime import datetime
 from fastapi import HTTPException, status 
 from jose import jwt, JWTError
@@ -7,9 +8,10 @@ from database.database import get_settings
 settings = get_settings()
 SECRET_KEY = settings.SECRET_KEY
 
-def create_access_token(user: str) -> str: 
+def create_access_token(user: str, user_id: Optional[int] = None) -> str: 
     payload = {
     "user": user,
+    "uid": user_id,
     "expires": time.time() + 3600
     }
     token = jwt.encode(payload, SECRET_KEY, algorithm="HS256")
@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from database.config import get_settings
+from models.user import User
+
+settings = get_settings()
+
+
+class UserCache:
+    """
+    Небольшой in-process кэш пользователей по id с TTL.
+    Позволяет разрешать пользователя из токена без обращения к БД.
+    При изменении пользователя запись нужно явно инвалидировать.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[int, tuple[float, User]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[User]:
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, user: User) -> None:
+        if self.maxsize <= 0 or user.id is None:
+            return
+        with self._lock:
+            self._data[user.id] = (time.monotonic() + self.ttl, user)
+            self._data.move_to_end(user.id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+user_cache = UserCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
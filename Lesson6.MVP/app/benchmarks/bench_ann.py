@@ -0,0 +1,88 @@
+"""
+Бенчмарк IVF-индекса против полного перебора.
+
+На синтетических кластеризованных векторах (10k / 100k / 1M) сравнивает
+recall@5 относительно точного поиска и QPS одиночных запросов
+для нескольких значений nprobe.
+
+Запуск из каталога app:
+    python -m benchmarks.bench_ann
+    python -m benchmarks.bench_ann --sizes 10000 100000 --nprobe 1 4 16
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ml_worker.ann import IVFIndex
+from ml_worker.scoring import EmbeddingIndex, l2_normalize
+
+
+def synthetic_catalog(n, dim, n_topics, rng, block_size=100_000):
+    """Векторы вокруг n_topics «тем»: у эмбеддингов докладов тоже есть кластерная структура."""
+    topics = l2_normalize(rng.standard_normal((n_topics, dim)))
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        labels = rng.integers(0, n_topics, size=stop - start)
+        noise = rng.standard_normal((stop - start, dim), dtype=np.float32) * (0.9 / np.sqrt(dim))
+        vectors[start:stop] = l2_normalize(topics[labels] + noise)
+    return vectors
+
+
+def qps(search, queries):
+    search(queries[:1])  # прогрев
+    started = time.perf_counter()
+    for query in queries:
+        search(query)
+    return len(queries) / (time.perf_counter() - started)
+
+
+def recall(found, truth):
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+def run(n, args):
+    rng = np.random.default_rng(n)
+    vectors = synthetic_catalog(n, args.dim, args.topics, rng)
+    # Запросы — зашумлённые точки каталога, как тексты, похожие на доклады
+    query_idx = rng.choice(n, size=args.queries, replace=False)
+    queries = l2_normalize(vectors[query_idx] + rng.standard_normal((args.queries, args.dim), dtype=np.float32) * 0.03)
+
+    exact = EmbeddingIndex(vectors, "bench")
+    truth = np.concatenate([exact.search(queries[i:i + 50], k=args.k)[0] for i in range(0, len(queries), 50)])
+
+    started = time.perf_counter()
+    ivf = IVFIndex.build(vectors, n_lists=args.lists, n_iter=args.iter)
+    build_time = time.perf_counter() - started
+
+    print(f"n={n}, dim={args.dim}, lists={ivf.n_lists}, build={build_time:.1f} s")
+    print(f"  exact              : recall@{args.k}=1.000  QPS={qps(lambda q: exact.search(q, k=args.k), queries):9.1f}")
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        found = ivf.search(queries, k=args.k)[0]
+        print(
+            f"  ivf nprobe={nprobe:<6} : recall@{args.k}={recall(found, truth):.3f}"
+            f"  QPS={qps(lambda q: ivf.search(q, k=args.k), queries):9.1f}"
+        )
+    del vectors, exact, ivf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--lists", type=int, default=None, help="число кластеров (по умолчанию sqrt(n))")
+    parser.add_argument("--iter", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        run(n, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Нагрузочный бенчмарк API при 50–500 одновременных клиентах.
+
+Каждый клиент в цикле запрашивает /users/me и историю предсказаний;
+для каждого уровня конкурентности печатаются запросы/сек, p50 и p99.
+Запускать против работающего стека (docker compose up), сравнивая
+результаты до и после перехода роутов на async-сессии.
+
+Запуск из каталога app:
+    python -m benchmarks.bench_api_concurrency --base-url http://localhost:8080/api
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+
+async def prepare_user(client: httpx.AsyncClient, base_url: str) -> tuple[dict, int]:
+    email = f"bench_{uuid.uuid4().hex[:12]}@example.com"
+    password = "strongpassword123"
+    await client.post(f"{base_url}/users/signup", json={"email": email, "password": password})
+    resp = await client.post(f"{base_url}/users/signin", data={"username": email, "password": password})
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    user_id = (await client.get(f"{base_url}/users/me", headers=headers)).json()["id"]
+    return headers, user_id
+
+
+async def worker(client, urls, headers, deadline, timings, errors):
+    i = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            resp = await client.get(urls[i % len(urls)], headers=headers)
+            if resp.status_code != 200:
+                errors.append(resp.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        timings.append(time.perf_counter() - started)
+        i += 1
+
+
+async def run_level(base_url, headers, user_id, concurrency, duration):
+    urls = [f"{base_url}/users/me", f"{base_url}/predictions/all/{user_id}"]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timings, errors = [], []
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*[
+            worker(client, urls, headers, deadline, timings, errors)
+            for _ in range(concurrency)
+        ])
+    p50, p99 = np.percentile(timings, [50, 99]) * 1e3
+    print(
+        f"concurrency={concurrency:4d}  {len(timings) / duration:8.1f} req/s  "
+        f"p50={p50:8.1f} ms  p99={p99:8.1f} ms  errors={len(errors)}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8080/api")
+    parser.add_argument("--levels", type=int, nargs="+", default=[50, 100, 250, 500])
+    parser.add_argument("--duration", type=float, default=15.0)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        headers, user_id = await prepare_user(client, args.base_url)
+
+    for concurrency in args.levels:
+        await run_level(args.base_url, headers, user_id, concurrency, args.duration)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""
+Время запроса с аутентификацией: до и после кэша пользователей.
+
+Сравнивает /users/me с токеном старого формата (только email —
+пользователь ищется в БД на каждый запрос) и с токеном, содержащим
+id пользователя (разрешается из in-process кэша без SQL).
+Нужен SECRET_KEY того же API, чтобы выпустить токен старого формата.
+
+Запуск из каталога app против работающего стека:
+    python -m benchmarks.bench_auth --base-url http://localhost:8080/api
+"""
+import argparse
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+from auth.jwt_handler import create_access_token
+
+
+def measure(client, url, headers, requests_count):
+    timings = []
+    for _ in range(requests_count):
+        started = time.perf_counter()
+        resp = client.get(url, headers=headers)
+        resp.raise_for_status()
+        timings.append(time.perf_counter() - started)
+    return np.percentile(timings, [50, 99]) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8080/api")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    email = f"bench_{uuid.uuid4().hex[:12]}@example.com"
+    password = "strongpassword123"
+    with httpx.Client(timeout=30) as client:
+        client.post(f"{args.base_url}/users/signup", json={"email": email, "password": password})
+        token = client.post(
+            f"{args.base_url}/users/signin", data={"username": email, "password": password}
+        ).json()["access_token"]
+
+        url = f"{args.base_url}/users/me"
+        variants = {
+            "email-only token (DB lookup)": {"Authorization": f"Bearer {create_access_token(email)}"},
+            "token with uid (cached)": {"Authorization": f"Bearer {token}"},
+        }
+        for name, headers in variants.items():
+            measure(client, url, headers, 50)  # прогрев
+            p50, p99 = measure(client, url, headers, args.requests)
+            print(f"{name:30s} p50={p50:6.2f} ms  p99={p99:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
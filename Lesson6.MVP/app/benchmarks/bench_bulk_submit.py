@@ -0,0 +1,56 @@
+"""
+Пропускная способность постановки задач: /send_task по одной против /send_tasks пачками.
+
+Задачи реально ставятся в очередь и будут обработаны воркерами.
+
+Запуск из каталога app против работающего стека:
+    python -m benchmarks.bench_bulk_submit --base-url http://localhost:8080/api
+    python -m benchmarks.bench_bulk_submit --tasks 5000 --batch-size 100 500 1000
+"""
+import argparse
+import time
+
+import httpx
+
+from benchmarks.bench_recommend_latency import QUERIES, signin
+
+
+def single(client, base_url, headers, tasks):
+    for i in range(tasks):
+        resp = client.post(f"{base_url}/ml/send_task", json={"input_data": QUERIES[i % len(QUERIES)]}, headers=headers)
+        resp.raise_for_status()
+
+
+def bulk(client, base_url, headers, tasks, batch_size):
+    for start in range(0, tasks, batch_size):
+        batch = [{"input_data": QUERIES[i % len(QUERIES)]} for i in range(start, min(start + batch_size, tasks))]
+        resp = client.post(f"{base_url}/ml/send_tasks", json={"tasks": batch}, headers=headers)
+        resp.raise_for_status()
+        assert not resp.json()["errors"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8080/api")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--single-tasks", type=int, default=500, help="задач для эндпоинта по одной")
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    with httpx.Client(timeout=120) as client:
+        headers = signin(client, args.base_url)
+
+        started = time.perf_counter()
+        single(client, args.base_url, headers, args.single_tasks)
+        rate = args.single_tasks / (time.perf_counter() - started)
+        print(f"send_task            : {rate:8.0f} tasks/s")
+
+        for batch_size in args.batch_size:
+            started = time.perf_counter()
+            bulk(client, args.base_url, headers, args.tasks, batch_size)
+            rate = args.tasks / (time.perf_counter() - started)
+            print(f"send_tasks batch={batch_size:<5d}: {rate:8.0f} tasks/s")
+
+
+if __name__ == "__main__":
+    main()
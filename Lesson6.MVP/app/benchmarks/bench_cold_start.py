@@ -0,0 +1,115 @@
+"""
+Холодный старт каталога воркера: прежний путь против артефакта catalog.bin.
+
+Каждый вариант запускается в отдельном процессе и меряет время от старта
+интерпретатора до готового каталога (импорты + загрузка) и пиковый RSS.
+Прежний путь: pandas.read_csv всего датасета + .npy + коды гибридной модели.
+Новый путь: memory-map catalog.bin без pandas.
+
+Загрузка SentenceTransformer одинакова в обоих вариантах и по умолчанию
+не включается (--with-model, чтобы добавить).
+
+Запуск из каталога app:
+    python -m benchmarks.bench_cold_start
+    python -m benchmarks.bench_cold_start --scale 100
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from ml_worker.catalog import CATALOG_FILENAME, build_catalog
+
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+APP_DIR = Path(__file__).parent.parent
+
+PROLOGUE = """
+import json, sys, time
+started = time.perf_counter()
+data_dir = sys.argv[1]
+"""
+
+LEGACY = """
+import pandas as pd
+from ml_worker.hybrid import FEATURES, encode_column
+from ml_worker.scoring import EmbeddingIndex
+df = pd.read_csv(f"{data_dir}/dataset_processed.csv")
+index = EmbeddingIndex.load(f"{data_dir}/sbert_embeddings.npy")
+codes = {column: encode_column(df[column]) for column in FEATURES}
+"""
+
+ARTIFACT = """
+from ml_worker.catalog import Catalog
+from ml_worker.scoring import EmbeddingIndex
+catalog = Catalog.load(data_dir)
+index = EmbeddingIndex(catalog.embeddings, catalog.version)
+codes = catalog.codes
+"""
+
+MODEL = """
+from sentence_transformers import SentenceTransformer
+model = SentenceTransformer(f"{data_dir}/sbert_model")
+"""
+
+# Пиковый RSS берём из VmHWM: ru_maxrss в Linux наследуется через exec от родителя
+EPILOGUE = """
+seconds = time.perf_counter() - started
+with open("/proc/self/status") as f:
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+print(json.dumps({"seconds": seconds, "rss_mb": peak_kb / 1024}))
+"""
+
+
+def measure(body, data_dir, repeats):
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", PROLOGUE + body + EPILOGUE, str(data_dir)],
+            cwd=APP_DIR, check=True, capture_output=True, text=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(run["seconds"] for run in runs), min(run["rss_mb"] for run in runs)
+
+
+def prepare_data_dir(tmp: Path, scale: int, model_dir: Path) -> Path:
+    """Каталог в scale раз больше исходного: повторённые строки и эмбеддинги."""
+    # Повторяем исходный текст CSV: повторная запись через pandas меняет разбор многострочных полей
+    header, body = (DATA_DIR / "dataset_processed.csv").read_bytes().split(b"\n", 1)
+    if not body.endswith(b"\n"):
+        body += b"\n"
+    (tmp / "dataset_processed.csv").write_bytes(header + b"\n" + body * scale)
+    embeddings = np.load(DATA_DIR / "sbert_embeddings.npy")
+    np.save(tmp / "sbert_embeddings.npy", np.tile(embeddings, (scale, 1)))
+    if model_dir.exists():
+        (tmp / "sbert_model").symlink_to(model_dir)
+    build_catalog(tmp, tmp / CATALOG_FILENAME)
+    # Нормированную копию строим заранее, как после первого старта прежнего воркера
+    subprocess.run([sys.executable, "-c", PROLOGUE + LEGACY, str(tmp)], cwd=APP_DIR, check=True)
+    return tmp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--with-model", action="store_true")
+    args = parser.parse_args()
+
+    extra = MODEL if args.with_model else ""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = prepare_data_dir(Path(tmp), args.scale, DATA_DIR / "sbert_model")
+        size = len(np.load(data_dir / "sbert_embeddings.npy", mmap_mode="r"))
+        legacy = measure(LEGACY + extra, data_dir, args.repeats)
+        artifact = measure(ARTIFACT + extra, data_dir, args.repeats)
+
+    print(f"catalog: {size} talks{' + SBERT model' if args.with_model else ''}")
+    print(f"  csv + pandas + npy : {legacy[0] * 1e3:8.1f} ms  peak RSS {legacy[1]:7.1f} MB")
+    print(f"  catalog.bin (mmap) : {artifact[0] * 1e3:8.1f} ms  peak RSS {artifact[1]:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Симуляция планирования очереди задач: задержка интерактивных запросов
+во время пакетной постановки.
+
+Модель: один воркер обрабатывает батчи до --batch задач, время батча
+a + b * размер. В момент 0 пакетная задача ставит --bulk-tasks задач
+(по --bulk-users пользователям), интерактивные пользователи присылают
+запросы пуассоновским потоком --rate в секунду.
+
+Сравниваются одна FIFO-очередь (как было) и раздельные очереди
+ml_task / ml_task.bulk с FairScheduler воркера (тот же код, что в
+ml_worker.batching): prefetch брокера, резерв доли батча под bulk,
+чередование пользователей.
+
+Запуск из каталога app:
+    python -m benchmarks.bench_fair_scheduling
+    python -m benchmarks.bench_fair_scheduling --bulk-tasks 20000 --rate 20 --bulk-users 3
+"""
+import argparse
+from collections import deque
+
+import numpy as np
+
+from ml_worker.batching import FairScheduler
+
+
+def arrivals(args, rng):
+    """(время, пользователь, bulk) — пакетные задачи в момент 0 и интерактивный поток."""
+    events = [(0.0, f"bulk-{i % args.bulk_users}", True) for i in range(args.bulk_tasks)]
+    t = 0.0
+    while True:
+        t += rng.exponential(1 / args.rate)
+        if t > args.duration:
+            break
+        events.append((t, f"user-{rng.integers(args.users)}", False))
+    return sorted(events, key=lambda event: event[0])
+
+
+def simulate(events, args, fair: bool):
+    """Возвращает задержки интерактивных задач и время завершения каждого bulk-пользователя."""
+    broker = {False: deque(), True: deque()}  # FIFO-очереди брокера
+    prefetch = {False: args.batch, True: args.bulk_prefetch if fair else 0}
+    unacked = {False: 0, True: 0}
+    scheduler = FairScheduler(args.bulk_share)
+    fifo = deque()  # прежний вариант: одна очередь, сообщения в буфере по порядку
+
+    now, i = 0.0, 0
+    latencies, bulk_done = [], {}
+    while i < len(events) or any(broker.values()) or len(scheduler) or fifo:
+        # Всё, что пришло к текущему моменту, попадает в очереди брокера
+        while i < len(events) and events[i][0] <= now:
+            arrived, user, bulk = events[i]
+            broker[bulk and fair].append((arrived, user, bulk))
+            i += 1
+
+        # Брокер отдаёт сообщения в пределах prefetch
+        for queue in (False, True):
+            while broker[queue] and unacked[queue] < prefetch[queue]:
+                message = broker[queue].popleft()
+                unacked[queue] += 1
+                if fair:
+                    scheduler.add(message, message[1], bulk=queue)
+                else:
+                    fifo.append(message)
+
+        if fair:
+            batch = scheduler.take(args.batch)
+        else:
+            batch = [fifo.popleft() for _ in range(min(args.batch, len(fifo)))]
+        if not batch:
+            now = events[i][0]
+            continue
+
+        now += args.batch_cost + args.task_cost * len(batch)
+        for arrived, user, bulk in batch:
+            unacked[bulk and fair] -= 1
+            if bulk:
+                bulk_done[user] = now
+            else:
+                latencies.append(now - arrived)
+    return np.array(latencies), bulk_done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bulk-tasks", type=int, default=10_000)
+    parser.add_argument("--bulk-users", type=int, default=2)
+    parser.add_argument("--users", type=int, default=50, help="интерактивных пользователей")
+    parser.add_argument("--rate", type=float, default=10.0, help="интерактивных запросов в секунду")
+    parser.add_argument("--duration", type=float, default=60.0, help="секунд интерактивного потока")
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--bulk-prefetch", type=int, default=128)
+    parser.add_argument("--bulk-share", type=float, default=0.25)
+    parser.add_argument("--batch-cost", type=float, default=0.020, help="секунд на батч")
+    parser.add_argument("--task-cost", type=float, default=0.004, help="секунд на задачу в батче")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    events = arrivals(args, np.random.default_rng(args.seed))
+    interactive = sum(1 for _, _, bulk in events if not bulk)
+    print(f"{args.bulk_tasks} bulk tasks ({args.bulk_users} users) + {interactive} interactive over {args.duration:.0f} s")
+    for name, fair in (("single FIFO queue", False), ("interactive + bulk", True)):
+        latencies, bulk_done = simulate(events, args, fair)
+        p50, p99 = np.percentile(latencies, [50, 99])
+        finished = ", ".join(f"{user} {t:.1f} s" for user, t in sorted(bulk_done.items()))
+        print(f"  {name:20s}: interactive p50={p50 * 1e3:8.1f} ms  p99={p99 * 1e3:8.1f} ms  bulk done: {finished}")
+
+
+if __name__ == "__main__":
+    main()
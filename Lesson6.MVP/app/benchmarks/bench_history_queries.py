@@ -0,0 +1,145 @@
+"""
+Бенчмарк горячих запросов к MLTask/MLPrediction на засеянной базе.
+
+Засевает ~1M задач (и столько же предсказаний) для пользователей
+bench_*@example.com, затем печатает планы (EXPLAIN ANALYZE) и время
+запросов истории и статусов. С флагом --without-indexes индексы
+временно удаляются, чтобы сравнить планы до и после.
+
+Запуск из каталога app (переменные DB_* как у API):
+    python -m benchmarks.bench_history_queries --tasks 1000000
+    python -m benchmarks.bench_history_queries --without-indexes
+    python -m benchmarks.bench_history_queries --cleanup
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlmodel import select
+
+from database.database import engine, init_db
+from models.ml_task import MLTask, TaskStatus
+from services.ml_task_service import MLTaskService
+from models.prediction import MLPrediction
+
+BENCH_RESULT = "bench result"
+
+INDEXES = {
+    "ix_mltask_user_id_created_at": "CREATE INDEX IF NOT EXISTS ix_mltask_user_id_created_at ON mltask (user_id, created_at)",
+    "ix_mltask_status_created_at": "CREATE INDEX IF NOT EXISTS ix_mltask_status_created_at ON mltask (status, created_at)",
+    "ix_mlprediction_user_id_timestamp": "CREATE INDEX IF NOT EXISTS ix_mlprediction_user_id_timestamp ON mlprediction (user_id, timestamp)",
+}
+
+
+def seed(conn, tasks: int, users: int) -> int:
+    conn.execute(text(
+        "INSERT INTO \"user\" (email, password) "
+        "SELECT 'bench_' || g || '@example.com', 'x' FROM generate_series(1, :users) g "
+        "ON CONFLICT (email) DO NOTHING"
+    ), {"users": users})
+    first_user = conn.execute(text(
+        "SELECT min(id) FROM \"user\" WHERE email LIKE 'bench\\_%@example.com'"
+    )).scalar_one()
+
+    existing = conn.execute(text(
+        "SELECT count(*) FROM mlprediction WHERE prediction_result = :r"
+    ), {"r": BENCH_RESULT}).scalar_one()
+    if existing < tasks:
+        started = time.perf_counter()
+        conn.execute(text(
+            "INSERT INTO mlprediction (user_id, model_name, prediction_result, timestamp) "
+            "SELECT :first_user + (g % :users), 'jug_recommender', :r, now() - g * interval '1 second' "
+            "FROM generate_series(1, :n) g"
+        ), {"first_user": first_user, "users": users, "r": BENCH_RESULT, "n": tasks - existing})
+        conn.execute(text(
+            "INSERT INTO mltask (user_id, model_name, input_data, status, created_at, updated_at, result_id) "
+            "SELECT p.user_id, p.model_name, 'bench query', "
+            "       (CASE WHEN p.id % 10 = 0 THEN 'PENDING' ELSE 'DONE' END)::taskstatus, "
+            "       p.timestamp, p.timestamp, p.id "
+            "FROM mlprediction p "
+            "WHERE p.prediction_result = :r "
+            "  AND NOT EXISTS (SELECT 1 FROM mltask t WHERE t.result_id = p.id)"
+        ), {"r": BENCH_RESULT})
+        print(f"Seeded {tasks - existing} tasks in {time.perf_counter() - started:.1f} s")
+    conn.execute(text("ANALYZE mltask"))
+    conn.execute(text("ANALYZE mlprediction"))
+    return first_user
+
+
+def cleanup(conn) -> None:
+    conn.execute(text(
+        "DELETE FROM mltask WHERE result_id IN (SELECT id FROM mlprediction WHERE prediction_result = :r)"
+    ), {"r": BENCH_RESULT})
+    conn.execute(text("DELETE FROM mlprediction WHERE prediction_result = :r"), {"r": BENCH_RESULT})
+    conn.execute(text("DELETE FROM \"user\" WHERE email LIKE 'bench\\_%@example.com'"))
+
+
+def compile_sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def explain(conn, name: str, sql: str, repeats: int) -> None:
+    plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).scalars().all()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        conn.execute(text(sql)).all()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f"\n=== {name}: median {timings[len(timings) // 2] * 1e3:.2f} ms, max {timings[-1] * 1e3:.2f} ms")
+    print("\n".join(plan))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--without-indexes", action="store_true")
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+
+    init_db()
+
+    with engine.begin() as conn:
+        if args.cleanup:
+            cleanup(conn)
+            return
+        user_id = seed(conn, args.tasks, args.users)
+
+    with engine.begin() as conn:
+        if args.without_indexes:
+            for name in INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+        newest_task = conn.execute(text(
+            "SELECT max(id) FROM mltask WHERE user_id = :u"
+        ), {"u": user_id}).scalar_one()
+
+        queries = {
+            "history, first page": compile_sql(MLTaskService.history_query(user_id, limit=50)),
+            "history, next page": compile_sql(MLTaskService.history_query(user_id, before_id=newest_task, limit=50)),
+            "prediction history": compile_sql(
+                select(MLPrediction)
+                .where(MLPrediction.user_id == user_id)
+                .order_by(MLPrediction.timestamp.desc())
+                .limit(50)
+            ),
+            "oldest pending tasks": compile_sql(
+                select(MLTask.id)
+                .where(MLTask.status == TaskStatus.PENDING)
+                .order_by(MLTask.created_at)
+                .limit(100)
+            ),
+        }
+        for name, sql in queries.items():
+            explain(conn, name, sql, args.repeats)
+
+        if args.without_indexes:
+            for ddl in INDEXES.values():
+                conn.execute(text(ddl))
+
+
+if __name__ == "__main__":
+    main()
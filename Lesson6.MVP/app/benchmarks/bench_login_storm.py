@@ -0,0 +1,74 @@
+"""
+Нагрузочный тест «шторм логинов».
+
+Параллельно с потоком /users/signin меряет задержку лёгкого эндпоинта
+(/health) — при хешировании в event loop его p99 растёт до сотен мс,
+при выносе bcrypt в пул потоков остаётся на уровне единиц мс.
+
+Запуск из каталога app против работающего стека:
+    python -m benchmarks.bench_login_storm --base-url http://localhost:8080 --logins 32
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+
+async def login_loop(client, base_url, credentials, deadline, timings):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        resp = await client.post(f"{base_url}/api/users/signin", data=credentials)
+        resp.raise_for_status()
+        timings.append(time.perf_counter() - started)
+
+
+async def probe_loop(client, base_url, deadline, timings, interval=0.01):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await client.get(f"{base_url}/health")
+        timings.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+def report(name, timings, duration):
+    p50, p99 = np.percentile(timings, [50, 99]) * 1e3
+    print(f"{name:8s} {len(timings) / duration:8.1f} req/s  p50={p50:8.1f} ms  p99={p99:8.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8080")
+    parser.add_argument("--logins", type=int, default=32, help="одновременных клиентов, выполняющих signin")
+    parser.add_argument("--duration", type=float, default=20.0)
+    args = parser.parse_args()
+
+    credentials = {"username": f"storm_{uuid.uuid4().hex[:12]}@example.com", "password": "strongpassword123"}
+    limits = httpx.Limits(max_connections=args.logins + 4)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        await client.post(
+            f"{args.base_url}/api/users/signup",
+            json={"email": credentials["username"], "password": credentials["password"]},
+        )
+
+        baseline = []
+        await probe_loop(client, args.base_url, time.perf_counter() + 3, baseline)
+        report("idle", baseline, 3)
+
+        login_timings, probe_timings = [], []
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(
+            probe_loop(client, args.base_url, deadline, probe_timings),
+            *[
+                login_loop(client, args.base_url, credentials, deadline, login_timings)
+                for _ in range(args.logins)
+            ],
+        )
+        report("signin", login_timings, args.duration)
+        report("health", probe_timings, args.duration)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+"""
+Бенчмарк задержки отправки задачи в RabbitMQ.
+
+Сравнивает прежнюю схему (новое соединение + queue_declare на каждое
+сообщение) с долгоживущим RabbitPublisher. Нужны переменные окружения
+RABBITMQ_* как у API. Сообщения пишутся в отдельную очередь, чтобы их
+не забрали воркеры.
+
+Запуск из каталога app:
+    python -m benchmarks.bench_publish --messages 500
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pika
+
+from services.rm import RabbitPublisher, connection_params
+
+BENCH_QUEUE = "ml_task_bench"
+
+
+def legacy_send(task_data: dict):
+    connection = pika.BlockingConnection(connection_params)
+    channel = connection.channel()
+    channel.queue_declare(queue=BENCH_QUEUE, durable=True)
+    channel.basic_publish(exchange='', routing_key=BENCH_QUEUE, body=json.dumps(task_data))
+    connection.close()
+
+
+def measure(send, messages):
+    timings = []
+    for i in range(messages):
+        started = time.perf_counter()
+        send({"task_id": i, "user_id": 0, "model_name": "bench", "input_data": "LLM"})
+        timings.append(time.perf_counter() - started)
+    return np.percentile(timings, 50) * 1e3, np.percentile(timings, 99) * 1e3, messages / sum(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    args = parser.parse_args()
+
+    results = {"connection per message": measure(legacy_send, args.messages)}
+    for confirms in (False, True):
+        publisher = RabbitPublisher(connection_params, queue=BENCH_QUEUE, confirms=confirms)
+        results[f"persistent publisher (confirms={confirms})"] = measure(publisher.publish, args.messages)
+        publisher.close()
+
+    for name, (p50, p99, rate) in results.items():
+        print(f"{name:40s} p50={p50:7.2f} ms  p99={p99:7.2f} ms  {rate:8.0f} msg/s")
+
+    connection = pika.BlockingConnection(connection_params)
+    connection.channel().queue_delete(queue=BENCH_QUEUE)
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Задержка /api/ml/recommend (инлайн-режим) против полного пути через очередь.
+
+Для очереди меряется время от POST /send_task до получения финального
+статуса из SSE-стрима задачи.
+
+Запуск из каталога app против работающего стека:
+    python -m benchmarks.bench_recommend_latency --base-url http://localhost:8080/api
+"""
+import argparse
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+QUERIES = ["LLM", "Kotlin", "архитектура", "тестирование мобильных приложений", "Java performance"]
+
+
+def signin(client, base_url):
+    email = f"bench_{uuid.uuid4().hex[:12]}@example.com"
+    password = "strongpassword123"
+    client.post(f"{base_url}/users/signup", json={"email": email, "password": password})
+    token = client.post(f"{base_url}/users/signin", data={"username": email, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def queued_roundtrip(client, base_url, headers, text):
+    task_id = client.post(f"{base_url}/ml/send_task", json={"input_data": text}, headers=headers).json()["task_id"]
+    with client.stream("GET", f"{base_url}/predictions/{task_id}/events", headers=headers) as resp:
+        for line in resp.iter_lines():
+            if '"DONE"' in line or '"FAILED"' in line:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8080/api")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with httpx.Client(timeout=60) as client:
+        headers = signin(client, args.base_url)
+
+        inline, modes = [], {}
+        for i in range(args.requests):
+            started = time.perf_counter()
+            resp = client.post(f"{args.base_url}/ml/recommend", json={"input_data": QUERIES[i % len(QUERIES)]}, headers=headers)
+            inline.append(time.perf_counter() - started)
+            mode = resp.json().get("mode")
+            modes[mode] = modes.get(mode, 0) + 1
+
+        queued = []
+        for i in range(min(args.requests, 50)):
+            started = time.perf_counter()
+            queued_roundtrip(client, args.base_url, headers, QUERIES[i % len(QUERIES)])
+            queued.append(time.perf_counter() - started)
+
+    for name, timings in (("recommend", inline), ("send_task + SSE", queued)):
+        p50, p99 = np.percentile(timings, [50, 99]) * 1e3
+        print(f"{name:16s} p50={p50:7.1f} ms  p99={p99:7.1f} ms")
+    print(f"recommend modes: {modes}")
+
+
+if __name__ == "__main__":
+    main()
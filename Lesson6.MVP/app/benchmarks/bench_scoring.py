@@ -0,0 +1,81 @@
+"""
+Микро-бенчмарк скоринга одного запроса против каталога.
+
+Сравнивает прежний путь (sklearn cosine_similarity + полный argsort)
+с EmbeddingIndex (предварительно нормированная матрица + argpartition)
+на текущем размере каталога и на каталоге в 100 раз больше.
+
+Запуск из каталога app:
+    python -m benchmarks.bench_scoring
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from ml_worker.scoring import EmbeddingIndex
+
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+
+
+def legacy_top_k(query, embeddings, k=5):
+    scores = cosine_similarity([query], embeddings)[0]
+    return np.argsort(-scores)[:k]
+
+
+def indexed_top_k(query, index, k=5):
+    idxs, _ = index.search(query, k=k)
+    return idxs[0]
+
+
+def measure(fn, repeats):
+    fn()  # прогрев
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return np.percentile(timings, 50) * 1e3, np.percentile(timings, 99) * 1e3
+
+
+def run(embeddings, label, repeats):
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(embeddings.shape[1]).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "embeddings.npy"
+        np.save(path, embeddings)
+        index = EmbeddingIndex.load(path)
+
+        assert set(legacy_top_k(query, embeddings)) == set(indexed_top_k(query, index))
+
+        legacy = measure(lambda: legacy_top_k(query, embeddings), repeats)
+        indexed = measure(lambda: indexed_top_k(query, index), repeats)
+
+    print(f"{label}: n={embeddings.shape[0]}, dim={embeddings.shape[1]}")
+    print(f"  cosine_similarity + argsort : p50={legacy[0]:8.3f} ms  p99={legacy[1]:8.3f} ms")
+    print(f"  normalized dot + argpartition: p50={indexed[0]:8.3f} ms  p99={indexed[1]:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", type=Path, default=DATA_DIR / "sbert_embeddings.npy")
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    embeddings = np.load(args.embeddings).astype(np.float32)
+    run(embeddings, "current catalog", args.repeats)
+
+    # Каталог в scale раз больше: исходные векторы с небольшим шумом
+    rng = np.random.default_rng(1)
+    scaled = np.tile(embeddings, (args.scale, 1))
+    scaled += rng.normal(scale=0.01, size=scaled.shape).astype(np.float32)
+    run(scaled, f"{args.scale}x catalog", max(args.repeats // 10, 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -16,10 +16,22 @@ class Settings(BaseSettings):
     COOKIE_NAME: Optional[str] = None
     SECRET_KEY: Optional[str] = None
 
+    # Хеширование паролей: стоимость bcrypt и размер пула потоков для него
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # Кэш пользователей, разрешённых из JWT
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: float = 60.0
+
     @property
     def DATABASE_URL(self):
         return f'postgresql://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}'
 
+    @property
+    def ASYNC_DATABASE_URL(self):
+        return f'postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}'
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
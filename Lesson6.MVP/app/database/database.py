@@ -1,7 +1,10 @@
 from __future__ import annotations
 
-from typing import Generator
+from pathlib import Path
+from typing import AsyncGenerator, Generator
 from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from .config import get_settings
@@ -10,6 +13,8 @@ from models.user import User
 from models.prediction import MLPrediction
 from models.ml_task import MLTask
 
+APP_DIR = Path(__file__).parent.parent
+
 
 def _create_engine():
     settings = get_settings()
@@ -36,7 +41,29 @@ SessionLocal = sessionmaker(
 )
 
 
-# Зависимость для FastAPI
+def _create_async_engine():
+    settings = get_settings()
+
+    return create_async_engine(
+        settings.ASYNC_DATABASE_URL,
+        pool_size=10,
+        max_overflow=20,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+    )
+
+
+async_engine = _create_async_engine()
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+# Зависимость для FastAPI (синхронные эндпоинты, выполняются в threadpool)
 def get_session() -> Generator[Session, None, None]:
     db = SessionLocal()
     try:
@@ -45,7 +72,26 @@ def get_session() -> Generator[Session, None, None]:
         db.close()
 
 
+# Зависимость для FastAPI (async-эндпоинты, не блокирует event loop)
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def run_migrations() -> None:
+    # Импорт внутри функции: alembic нужен только процессу, который мигрирует схему
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(APP_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(APP_DIR / "migrations"))
+    config.attributes["configure_logger"] = False
+    config.attributes["engine"] = engine
+    command.upgrade(config, "head")
+
+
 def init_db(drop_all: bool = False) -> None:
     if drop_all:
         SQLModel.metadata.drop_all(engine)
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine)
+    run_migrations()
\ No newline at end of file
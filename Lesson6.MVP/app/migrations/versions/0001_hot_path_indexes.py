@@ -0,0 +1,42 @@
+"""Composite indexes for task history and status queries
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Таблицы создаются через SQLModel.metadata.create_all в init_db, поэтому
+на новой базе индексы уже есть; на существующей — создаются здесь.
+CONCURRENTLY не блокирует запись в рабочие таблицы.
+"""
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_mltask_user_id_created_at", "mltask", ["user_id", "created_at"]),
+    ("ix_mltask_status_created_at", "mltask", ["status", "created_at"]),
+    ("ix_mlprediction_user_id_timestamp", "mlprediction", ["user_id", "timestamp"]),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(
+                name, table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,30 @@
+"""Catalog version on predictions
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Версия каталога докладов, по которой посчитан результат. Для старых
+записей остаётся NULL. На новой базе колонку уже создал create_all.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    if not _has_column("mlprediction", "catalog_version"):
+        op.add_column("mlprediction", sa.Column("catalog_version", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    if _has_column("mlprediction", "catalog_version"):
+        op.drop_column("mlprediction", "catalog_version")
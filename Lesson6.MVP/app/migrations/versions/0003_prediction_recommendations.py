@@ -0,0 +1,148 @@
+"""Structured recommendations on predictions
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Результат хранится как [[talk_id, score], ...] в mlprediction.recommendations,
+текст ответа собирается из каталога при чтении. Старые записи переводятся
+разбором текста: строки «N. [категория] название — спикер (конференция)»
+ищутся среди строк каталога своей версии, score неизвестен (NULL).
+Исходный текст сохраняется: API отдаёт его, если каталог версии записи
+недоступен или изменился. Записи, которые разобрать не удалось, остаются
+только с текстом.
+"""
+import logging
+import re
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Строка результата начинается с «N. »; переводы строк внутри полей (спикер) так не начинаются
+_ITEM_SPLIT_RE = re.compile(r"\n(?=\d+\. )")
+_ITEM_RE = re.compile(r"(\d+)\. (.*)", re.DOTALL)
+
+predictions = sa.table(
+    "mlprediction",
+    sa.column("id", sa.Integer),
+    sa.column("prediction_result", sa.String),
+    sa.column("recommendations", sa.JSON(none_as_null=True)),
+    sa.column("catalog_version", sa.String),
+)
+
+
+def _has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+class _Catalogs:
+    """Каталоги версий и индекс «строка -> talk_id» для разбора старых ответов."""
+
+    def __init__(self):
+        from ml_worker.catalog import Catalog, catalog_dir_for_version
+        from ml_worker.recommender import DEFAULT_DATA_DIR
+
+        self._open = lambda version: Catalog.load(catalog_dir_for_version(DEFAULT_DATA_DIR, version))
+        self._catalogs = {}
+        self._line_ids = {}
+
+    def get(self, version):
+        if version not in self._catalogs:
+            self._catalogs[version] = self._open(version)
+        return self._catalogs[version]
+
+    def parse(self, text: str, version):
+        if version not in self._line_ids:
+            catalog = self.get(version)
+            line_ids = {}
+            for talk_id in range(len(catalog)):
+                line_ids.setdefault(catalog.line(talk_id), talk_id)
+            self._line_ids[version] = line_ids
+        line_ids = self._line_ids[version]
+
+        recommendations = []
+        for rank, part in enumerate(_ITEM_SPLIT_RE.split(text), start=1):
+            match = _ITEM_RE.fullmatch(part)
+            if match is None or int(match.group(1)) != rank or match.group(2) not in line_ids:
+                return None
+            recommendations.append([line_ids[match.group(2)], None])
+        return recommendations
+
+
+def _batches(bind, where):
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(predictions.c.id, predictions.c.prediction_result,
+                      predictions.c.recommendations, predictions.c.catalog_version)
+            .where(predictions.c.id > last_id, where)
+            .order_by(predictions.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    if not _has_column("mlprediction", "recommendations"):
+        op.add_column("mlprediction", sa.Column("recommendations", sa.JSON(), nullable=True))
+
+    try:
+        catalogs = _Catalogs()
+    except Exception as e:
+        logger.warning(f"Catalog unavailable, predictions keep their text results: {e}")
+        return
+
+    bind = op.get_bind()
+    converted = skipped = 0
+    for rows in _batches(bind, sa.and_(predictions.c.recommendations.is_(None), predictions.c.prediction_result != "")):
+        updates = []
+        for row in rows:
+            try:
+                recommendations = catalogs.parse(row.prediction_result, row.catalog_version)
+            except Exception as e:
+                logger.warning(f"Catalog {row.catalog_version} unavailable: {e}")
+                recommendations = None
+            if recommendations is None:
+                skipped += 1
+                continue
+            updates.append({"row_id": row.id, "items": recommendations})
+        if updates:
+            bind.execute(
+                predictions.update()
+                .where(predictions.c.id == sa.bindparam("row_id"))
+                .values(recommendations=sa.bindparam("items")),
+                updates,
+            )
+            converted += len(updates)
+    logger.info(f"Predictions converted to structured results: {converted}, kept as text: {skipped}")
+
+
+def downgrade() -> None:
+    if not _has_column("mlprediction", "recommendations"):
+        return
+
+    # Возвращаем текст ответа записям, у которых его нет (результаты после миграции)
+    catalogs = _Catalogs()
+    bind = op.get_bind()
+    for rows in _batches(bind, sa.and_(predictions.c.recommendations.is_not(None), predictions.c.prediction_result == "")):
+        bind.execute(
+            predictions.update()
+            .where(predictions.c.id == sa.bindparam("row_id"))
+            .values(prediction_result=sa.bindparam("text")),
+            [
+                {"row_id": row.id, "text": catalogs.get(row.catalog_version).render(row.recommendations)}
+                for row in rows
+            ],
+        )
+    op.drop_column("mlprediction", "recommendations")
@@ -0,0 +1,206 @@
+"""
+Приближённый поиск ближайших соседей (IVF) для больших каталогов.
+
+Каталог разбивается сферическим k-means на n_lists кластеров; векторы
+хранятся на диске сгруппированными по кластерам, поэтому поиск — это
+скалярное произведение с nprobe ближайшими кластерами вместо всего каталога.
+Баланс полноты и скорости настраивается через nprobe без пересборки.
+
+Сборка из каталога app:
+    python -m ml_worker.ann build --lists 1024
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from ml_worker.scoring import l2_normalize, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block_size: int = 65536) -> np.ndarray:
+    """Номер ближайшего центроида для каждого вектора; считается блоками, чтобы не держать n×L в памяти."""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_size):
+        block = l2_normalize(vectors[start:start + block_size])
+        labels[start:start + block_size] = (block @ centroids.T).argmax(axis=1)
+    return labels
+
+
+def train_centroids(
+    vectors: np.ndarray,
+    n_lists: int,
+    n_iter: int = 20,
+    sample_size: int = 100_000,
+    seed: int = 0,
+) -> np.ndarray:
+    """Сферический k-means на случайной подвыборке каталога."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_idx = np.sort(rng.choice(n, size=min(n, max(sample_size, n_lists)), replace=False))
+    sample = l2_normalize(vectors[sample_idx])
+
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+    for _ in range(n_iter):
+        labels = (sample @ centroids.T).argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.bincount(labels, minlength=n_lists) == 0
+        # Пустые кластеры переинициализируем случайными точками
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        centroids = l2_normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Инвертированный индекс: центроиды, границы списков и векторы,
+    упорядоченные по спискам (memory-map). Интерфейс совпадает с
+    EmbeddingIndex.search: индексы исходного каталога и косинусные оценки.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        ids: np.ndarray,
+        vectors: np.ndarray,
+        build_version: str,
+        nprobe: int = 8,
+    ):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.vectors = vectors
+        self.build_version = build_version
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def version(self) -> str:
+        # nprobe меняет выдачу, поэтому входит в версию (ключ кэша результатов)
+        return f"{self.build_version}-ivf{self.nprobe}"
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        n_lists: Optional[int] = None,
+        n_iter: int = 20,
+        seed: int = 0,
+        nprobe: int = 8,
+        build_version: str = "",
+    ) -> "IVFIndex":
+        n = len(embeddings)
+        n_lists = min(n_lists or max(1, int(np.sqrt(n))), n)
+        centroids = train_centroids(embeddings, n_lists, n_iter=n_iter, seed=seed)
+        labels = _assign(embeddings, centroids)
+
+        ids = np.argsort(labels, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+        vectors = np.empty((n, embeddings.shape[1]), dtype=np.float32)
+        for start in range(0, n, 65536):
+            vectors[start:start + 65536] = l2_normalize(embeddings[ids[start:start + 65536]])
+        return cls(centroids, offsets, ids, vectors, build_version, nprobe=nprobe)
+
+    def save(self, path: Path) -> None:
+        """Каталог индекса пишется во временный и атомарно подменяет старый."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Уникальный временный каталог: сборщики на общем томе не пишут в один
+        tmp_path = Path(tempfile.mkdtemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent))
+        tmp_path.chmod(0o755)
+        np.save(tmp_path / "centroids.npy", self.centroids)
+        np.save(tmp_path / "offsets.npy", self.offsets)
+        np.save(tmp_path / "ids.npy", self.ids)
+        np.save(tmp_path / "vectors.npy", self.vectors)
+        with open(tmp_path / "meta.json", "w") as f:
+            json.dump({"version": self.build_version, "n_lists": self.n_lists, "size": len(self)}, f)
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, nprobe: int = 8) -> "IVFIndex":
+        path = Path(path)
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+        index = cls(
+            centroids=np.load(path / "centroids.npy"),
+            offsets=np.load(path / "offsets.npy"),
+            ids=np.load(path / "ids.npy", mmap_mode="r"),
+            vectors=np.load(path / "vectors.npy", mmap_mode="r"),
+            build_version=meta["version"],
+            nprobe=nprobe,
+        )
+        logger.info(f"IVF index loaded: {len(index)} vectors, {index.n_lists} lists, nprobe={nprobe}")
+        return index
+
+    def _search_one(self, query: np.ndarray, lists: np.ndarray, k: int):
+        # Просматриваем nprobe ближайших списков, но не меньше, чем нужно для k кандидатов
+        sizes = self.offsets[lists + 1] - self.offsets[lists]
+        n_probe = max(min(self.nprobe, len(lists)), int(np.searchsorted(np.cumsum(sizes), k)) + 1)
+        lists = lists[:n_probe]
+
+        positions = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+        scores = np.concatenate([self.vectors[self.offsets[l]:self.offsets[l + 1]] @ query for l in lists])
+        best = top_k_indices(scores, k)
+        return self.ids[positions[best]], scores[best]
+
+    def search(self, query_embeddings: np.ndarray, k: int = 5):
+        queries = l2_normalize(np.atleast_2d(query_embeddings))
+        k = min(k, len(self))
+        list_order = np.argsort(-(queries @ self.centroids.T), axis=1)
+
+        idxs = np.empty((len(queries), k), dtype=np.int64)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        for row, (query, lists) in enumerate(zip(queries, list_order)):
+            idxs[row], scores[row] = self._search_one(query, lists, k)
+        return idxs, scores
+
+
+def index_path_for(embeddings_path: Path) -> Path:
+    embeddings_path = Path(embeddings_path)
+    return embeddings_path.with_name(f"{embeddings_path.stem}.ivf")
+
+
+def main():
+    from ml_worker.recommender import DEFAULT_DATA_DIR
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="собрать IVF-индекс по файлу эмбеддингов")
+    build_parser.add_argument("--embeddings", type=Path, default=DEFAULT_DATA_DIR / "sbert_embeddings.npy")
+    build_parser.add_argument("--lists", type=int, default=None, help="число кластеров (по умолчанию sqrt(n))")
+    build_parser.add_argument("--iter", type=int, default=20)
+    build_parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    embeddings = np.load(args.embeddings, mmap_mode="r")
+    stat = args.embeddings.stat()
+    build_version = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}:{args.lists}".encode()).hexdigest()[:12]
+
+    index = IVFIndex.build(embeddings, n_lists=args.lists, n_iter=args.iter, build_version=build_version)
+    output = args.output or index_path_for(args.embeddings)
+    index.save(output)
+    logger.info(f"✅ IVF index saved to {output}: {len(index)} vectors, {index.n_lists} lists")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import json
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Callable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+USER_HEADER = "x-user-id"
+
+
+class Delivery(NamedTuple):
+    method: object
+    properties: object
+    body: bytes
+
+
+def delivery_user(delivery: Delivery):
+    """Пользователь задачи: из заголовка x-user-id, для старых сообщений — из тела."""
+    headers = getattr(delivery.properties, "headers", None) or {}
+    if USER_HEADER in headers:
+        return headers[USER_HEADER]
+    try:
+        return json.loads(delivery.body).get("user_id")
+    except (ValueError, AttributeError):
+        return None
+
+
+class UserRoundRobin:
+    """Буфер сообщений одной очереди: выдаёт их по кругу между пользователями."""
+
+    def __init__(self):
+        self._by_user: "OrderedDict[object, deque]" = OrderedDict()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, item, user_id) -> None:
+        self._by_user.setdefault(user_id, deque()).append(item)
+        self._size += 1
+
+    def pop(self):
+        user_id, items = next(iter(self._by_user.items()))
+        item = items.popleft()
+        if items:
+            self._by_user.move_to_end(user_id)
+        else:
+            del self._by_user[user_id]
+        self._size -= 1
+        return item
+
+
+class FairScheduler:
+    """
+    Собирает батч из интерактивной и фоновой (bulk) очередей.
+
+    Интерактивные сообщения идут первыми, но если bulk-сообщения ждут,
+    под них резервируется не меньше bulk_share батча — пакетная задача
+    не голодает. Внутри каждой очереди сообщения чередуются по пользователям.
+    """
+
+    def __init__(self, bulk_share: float = 0.25):
+        self.bulk_share = bulk_share
+        self.interactive = UserRoundRobin()
+        self.bulk = UserRoundRobin()
+
+    def __len__(self) -> int:
+        return len(self.interactive) + len(self.bulk)
+
+    def add(self, item, user_id, bulk: bool = False) -> None:
+        (self.bulk if bulk else self.interactive).append(item, user_id)
+
+    def take(self, max_batch: int) -> list:
+        reserved = min(len(self.bulk), math.ceil(max_batch * self.bulk_share))
+        interactive = min(len(self.interactive), max_batch - reserved)
+        bulk = min(len(self.bulk), max_batch - interactive)
+        return [self.interactive.pop() for _ in range(interactive)] + [self.bulk.pop() for _ in range(bulk)]
+
+
+class BatchConsumer:
+    """
+    Потребитель RabbitMQ, собирающий сообщения в микро-батчи.
+
+    Первое сообщение ждём без ограничения по времени, затем добираем батч
+    до max_batch сообщений, но не дольше max_wait секунд. Обработчик
+    получает весь батч и сам подтверждает каждое сообщение.
+
+    Если задана bulk_queue, сообщения из неё планируются FairScheduler:
+    интерактивные запросы не ждут за тысячами задач пакетной постановки.
+    Из bulk-очереди берётся с запасом (bulk_prefetch), чтобы в буфере
+    были задачи разных пользователей.
+    """
+
+    def __init__(
+        self,
+        connection,
+        queue: str,
+        handler: Callable[[object, List[Delivery]], None],
+        max_batch: int = 32,
+        max_wait: float = 0.05,
+        bulk_queue: Optional[str] = None,
+        bulk_prefetch: Optional[int] = None,
+        bulk_share: float = 0.25,
+    ):
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        self.connection = connection
+        self.channel = connection.channel()
+        self.queue = queue
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.bulk_queue = bulk_queue
+        self.bulk_prefetch = bulk_prefetch or max_batch * 4
+        self.scheduler = FairScheduler(bulk_share)
+
+    def _on_message(self, ch, method, properties, body):
+        delivery = Delivery(method, properties, body)
+        self.scheduler.add(delivery, delivery_user(delivery), bulk=False)
+
+    def _on_bulk_message(self, ch, method, properties, body):
+        delivery = Delivery(method, properties, body)
+        self.scheduler.add(delivery, delivery_user(delivery), bulk=True)
+
+    def _fill_batch(self) -> None:
+        # Блокируемся до первого события (сообщение или heartbeat)
+        while not len(self.scheduler):
+            self.connection.process_data_events(time_limit=None)
+
+        deadline = time.monotonic() + self.max_wait
+        while len(self.scheduler) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.connection.process_data_events(time_limit=remaining)
+
+    def start_consuming(self) -> None:
+        self.channel.queue_declare(queue=self.queue, durable=True)
+        # Брокер не отдаст больше max_batch неподтверждённых сообщений
+        # (prefetch считается на каждого потребителя канала отдельно)
+        self.channel.basic_qos(prefetch_count=self.max_batch)
+        self.channel.basic_consume(
+            queue=self.queue,
+            on_message_callback=self._on_message,
+            auto_ack=False,
+        )
+        if self.bulk_queue:
+            self.channel.queue_declare(queue=self.bulk_queue, durable=True)
+            self.channel.basic_qos(prefetch_count=self.bulk_prefetch)
+            self.channel.basic_consume(
+                queue=self.bulk_queue,
+                on_message_callback=self._on_bulk_message,
+                auto_ack=False,
+            )
+
+        while True:
+            self._fill_batch()
+            batch = self.scheduler.take(self.max_batch)
+            started = time.perf_counter()
+            self.handler(self.channel, batch)
+            logger.info(
+                f"Batch of {len(batch)} processed in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
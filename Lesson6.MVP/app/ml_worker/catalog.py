@@ -0,0 +1,401 @@
+"""
+Компактный бинарный артефакт каталога для быстрого старта воркера.
+
+Один файл с версией: нормированные эмбеддинги (float32, float16 или
+int8 с масштабом на строку), коды категориальных признаков гибридной
+модели, поля докладов для структурированного ответа и заранее
+отрисованные строки результатов (без номера позиции).
+Все массивы выровнены и открываются через memory-map, поэтому воркеру
+не нужны ни pandas, ни разбор CSV.
+
+Формат: MAGIC (8 байт) | длина заголовка (uint64 LE) | JSON-заголовок |
+массивы, каждый с отступом, кратным ALIGNMENT.
+
+Версии каталога хранятся в data/catalogs/<версия>/ (исходники + артефакт),
+файл data/catalogs/CURRENT указывает на активную; без него используется
+исходная раскладка data/. Команда append кодирует только новые доклады
+и публикует следующую версию — воркеры подхватывают её между батчами.
+
+Сборка из каталога app:
+    python -m ml_worker.catalog build
+    python -m ml_worker.catalog build --precision int8
+    python -m ml_worker.catalog append new_talks.csv
+    python -m ml_worker.catalog use v0001
+"""
+import argparse
+import csv
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import struct
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from ml_worker.hybrid import FEATURES
+from ml_worker.scoring import PRECISIONS, l2_normalize, quantize
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"JUGCAT02"
+ALIGNMENT = 64
+CATALOG_FILENAME = "catalog.bin"
+CATALOGS_DIRNAME = "catalogs"
+CURRENT_FILENAME = "CURRENT"
+APPEND_LOCK_FILENAME = ".append.lock"
+# По этим полям доклад считается уже добавленным в каталог
+TALK_KEY = ["title", "speaker", "conf"]
+# Поля доклада в структурированном результате
+TALK_FIELDS = ["title", "speaker", "category", "conf"]
+
+
+def catalog_filename(precision: str = "float32") -> str:
+    return CATALOG_FILENAME if precision == "float32" else f"catalog.{precision}.bin"
+
+
+def render_line(row) -> str:
+    return f"[{row['category']}] {row['title']} — {row['speaker']} ({row['conf']})"
+
+
+def clean_field(value) -> str:
+    """Значение поля для ответа API: без пропусков (NaN -> "") и краевых пробелов/переводов строк."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    return str(value).strip()
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _string_column(name: str, values: list) -> dict:
+    """Строки переменной длины: смещения (n + 1) и общий буфер UTF-8."""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return {
+        f"{name}_offsets": offsets,
+        f"{name}_data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    }
+
+
+def write_catalog(
+    path: Path,
+    embeddings: np.ndarray,
+    codes: dict,
+    lines: list,
+    fields: dict,
+    precision: str = "float32",
+) -> str:
+    """Записывает артефакт атомарно и возвращает его версию (хеш содержимого)."""
+    data, scales = quantize(l2_normalize(embeddings), precision)
+    arrays = {
+        "embeddings": np.ascontiguousarray(data),
+        **({"embedding_scales": scales} if scales is not None else {}),
+        **_string_column("line", lines),
+        **{key: value for field in TALK_FIELDS for key, value in _string_column(field, fields[field]).items()},
+        **{f"codes_{column}": np.ascontiguousarray(codes[column], dtype=np.int32) for column in FEATURES},
+    }
+
+    digest = hashlib.sha1()
+    for name, array in arrays.items():
+        digest.update(name.encode())
+        digest.update(array.tobytes())
+    version = digest.hexdigest()[:12]
+
+    # Смещения массивов считаются от начала области данных, чтобы не зависеть от длины заголовка
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+    header = json.dumps({
+        "version": version,
+        "precision": precision,
+        "size": len(lines),
+        "dim": int(arrays["embeddings"].shape[1]),
+        "arrays": layout,
+    }).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    path = Path(path)
+    # Уникальный временный файл: API и воркеры (PID 1 в своих контейнерах)
+    # могут собирать артефакт одновременно на общем томе
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(array.tobytes())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return version
+
+
+def build_catalog(data_dir: Path, path: Path, precision: str = "float32") -> str:
+    """Собирает артефакт из dataset_processed.csv и sbert_embeddings.npy."""
+    import pandas as pd
+
+    from ml_worker.hybrid import encode_column
+
+    df = pd.read_csv(data_dir / "dataset_processed.csv", usecols=["title", "speaker", "category", "conf", "companies"])
+    embeddings = np.load(data_dir / "sbert_embeddings.npy")
+    if len(df) != len(embeddings):
+        raise ValueError(f"Catalog size mismatch: {len(df)} rows vs {len(embeddings)} embeddings")
+
+    codes = {column: encode_column(df[column]) for column in FEATURES}
+    lines = [render_line(row) for row in df.to_dict("records")]
+    fields = {field: [clean_field(value) for value in df[field]] for field in TALK_FIELDS}
+    return write_catalog(path, embeddings, codes, lines, fields, precision=precision)
+
+
+def resolve_catalog_dir(data_dir: Path) -> Path:
+    """Директория активной версии каталога."""
+    data_dir = Path(data_dir)
+    current = data_dir / CATALOGS_DIRNAME / CURRENT_FILENAME
+    if current.exists():
+        return current.parent / current.read_text().strip()
+    return data_dir
+
+
+def catalog_hash_for_version(catalog_version: Optional[str]) -> Optional[str]:
+    """Хеш содержимого каталога из catalog_version результата (<имя>-<хеш>[-<версия индекса>])."""
+    parts = (catalog_version or "").split("-")
+    return parts[1] if len(parts) > 1 else None
+
+
+def catalog_dir_for_version(data_dir: Path, catalog_version: Optional[str]) -> Path:
+    """
+    Директория версии каталога по catalog_version результата (v0002-<хеш>…
+    или base-<хеш>…). Если версия неизвестна или уже удалена — активная;
+    совпадение содержимого проверяет вызывающий (catalog_hash_for_version).
+    """
+    data_dir = Path(data_dir)
+    name = (catalog_version or "").split("-", 1)[0]
+    if name == "base":
+        return data_dir
+    if name and (data_dir / CATALOGS_DIRNAME / name).is_dir():
+        return data_dir / CATALOGS_DIRNAME / name
+    return resolve_catalog_dir(data_dir)
+
+
+def set_current(data_dir: Path, version_name: str) -> None:
+    catalogs_dir = Path(data_dir) / CATALOGS_DIRNAME
+    if not (catalogs_dir / version_name).is_dir():
+        raise ValueError(f"Unknown catalog version: {version_name}")
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{CURRENT_FILENAME}.", suffix=".tmp", dir=catalogs_dir)
+    with os.fdopen(fd, "w") as f:
+        f.write(version_name)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, catalogs_dir / CURRENT_FILENAME)
+
+
+def _next_version_name(catalogs_dir: Path) -> str:
+    numbers = [int(path.name[1:]) for path in catalogs_dir.glob("v[0-9]*") if path.name[1:].isdigit()]
+    return f"v{max(numbers, default=0) + 1:04d}"
+
+
+@contextmanager
+def _append_lock(catalogs_dir: Path):
+    """
+    Один append за раз (flock работает и между контейнерами на общем томе):
+    иначе параллельные append читают одну исходную версию, выбирают одно имя
+    vNNNN, и один из них теряет работу или доклады другого.
+    """
+    with open(catalogs_dir / APPEND_LOCK_FILENAME, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def append_talks(
+    data_dir: Path,
+    new_talks_path: Path,
+    model=None,
+    precisions=("float32",),
+    build_ivf: bool = False,
+) -> Optional[str]:
+    """
+    Добавляет в каталог доклады из CSV (колонки как в dataset_processed.csv),
+    кодируя SBERT только новые. Публикует новую версию и возвращает её имя
+    либо None, если новых докладов нет.
+    """
+    data_dir = Path(data_dir)
+    catalogs_dir = data_dir / CATALOGS_DIRNAME
+    catalogs_dir.mkdir(exist_ok=True)
+    with _append_lock(catalogs_dir):
+        return _append_talks(data_dir, catalogs_dir, new_talks_path, model, precisions, build_ivf)
+
+
+def _append_talks(data_dir, catalogs_dir, new_talks_path, model, precisions, build_ivf) -> Optional[str]:
+    import pandas as pd
+
+    source_dir = resolve_catalog_dir(data_dir)
+    df = pd.read_csv(source_dir / "dataset_processed.csv")
+    embeddings = np.load(source_dir / "sbert_embeddings.npy")
+
+    new = pd.read_csv(new_talks_path)
+    missing = set(df.columns) - set(new.columns)
+    if missing:
+        raise ValueError(f"New talks file lacks columns: {sorted(missing)}")
+    existing = set(df[TALK_KEY].astype(str).itertuples(index=False, name=None))
+    is_new = ~new[TALK_KEY].astype(str).apply(tuple, axis=1).isin(existing)
+    new = new[is_new].drop_duplicates(TALK_KEY)[df.columns]
+    if new.empty:
+        logger.info("No new talks to append")
+        return None
+
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(str(data_dir / "sbert_model"))
+    # Как в ноутбуке Lesson 5: эмбеддинги строятся по колонке content
+    new_embeddings = np.asarray(model.encode(new["content"].tolist()), dtype=np.float32)
+
+    version_name = _next_version_name(catalogs_dir)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{version_name}.", suffix=".tmp", dir=catalogs_dir))
+    tmp_dir.chmod(0o755)
+    try:
+        # QUOTE_NONNUMERIC: в полях есть одиночные \r, без кавычек CSV читается с лишними строками
+        pd.concat([df, new], ignore_index=True).to_csv(
+            tmp_dir / "dataset_processed.csv", index=False, quoting=csv.QUOTE_NONNUMERIC
+        )
+        np.save(tmp_dir / "sbert_embeddings.npy", np.concatenate([embeddings, new_embeddings]))
+        for precision in precisions:
+            build_catalog(tmp_dir, tmp_dir / catalog_filename(precision), precision=precision)
+        if build_ivf:
+            from ml_worker.ann import IVFIndex, index_path_for
+
+            all_embeddings = np.load(tmp_dir / "sbert_embeddings.npy", mmap_mode="r")
+            IVFIndex.build(all_embeddings, build_version=version_name).save(
+                index_path_for(tmp_dir / "sbert_embeddings.npy")
+            )
+
+        os.replace(tmp_dir, catalogs_dir / version_name)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    set_current(data_dir, version_name)
+    logger.info(f"✅ Catalog {version_name}: {len(df)} + {len(new)} talks (from {source_dir})")
+    return version_name
+
+
+def _has_current_format(path: Path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class Catalog:
+    """Каталог докладов поверх memory-map артефакта; только чтение."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a catalog artifact: {self.path}")
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_size))
+        data_start = _align(len(MAGIC) + 8 + header_size)
+
+        self.version = header["version"]
+        self.precision = header.get("precision", "float32")
+        buffer = np.memmap(self.path, dtype=np.uint8, mode="r")
+        self._arrays = {
+            name: np.ndarray(
+                shape=tuple(spec["shape"]),
+                dtype=np.dtype(spec["dtype"]),
+                buffer=buffer,
+                offset=data_start + spec["offset"],
+            )
+            for name, spec in header["arrays"].items()
+        }
+        self.embeddings = self._arrays["embeddings"]
+        self.embedding_scales = self._arrays.get("embedding_scales")
+        self.codes = {column: self._arrays[f"codes_{column}"] for column in FEATURES}
+
+    @classmethod
+    def load(cls, data_dir: Path, precision: str = "float32") -> "Catalog":
+        """Открывает артефакт нужной точности; пересобирает, если его нет или исходники новее."""
+        data_dir = Path(data_dir)
+        path = data_dir / catalog_filename(precision)
+        sources = [data_dir / "dataset_processed.csv", data_dir / "sbert_embeddings.npy"]
+        if not path.exists() or not _has_current_format(path) or (
+            all(source.exists() for source in sources)
+            and path.stat().st_mtime_ns < max(source.stat().st_mtime_ns for source in sources)
+        ):
+            logger.info(f"Building catalog artifact: {path}")
+            build_catalog(data_dir, path, precision=precision)
+        return cls(path)
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    def _string(self, name: str, idx: int) -> str:
+        offsets, data = self._arrays[f"{name}_offsets"], self._arrays[f"{name}_data"]
+        return data[offsets[idx]:offsets[idx + 1]].tobytes().decode("utf-8")
+
+    def line(self, idx: int) -> str:
+        return self._string("line", idx)
+
+    def talk(self, idx: int) -> dict:
+        return {field: self._string(field, idx) or None for field in TALK_FIELDS}
+
+    def render(self, recommendations: list) -> str:
+        """Текстовый вид результата [[talk_id, score], ...]: «N. [категория] название — спикер (конференция)»."""
+        return "\n".join(f"{i+1}. {self.line(talk_id)}" for i, (talk_id, _) in enumerate(recommendations))
+
+    def describe(self, recommendations: list) -> list:
+        """Структурированный вид результата для API."""
+        return [
+            {"rank": i + 1, "talk_id": talk_id, "score": score, **self.talk(talk_id)}
+            for i, (talk_id, score) in enumerate(recommendations)
+        ]
+
+
+def main():
+    from ml_worker.recommender import DEFAULT_DATA_DIR
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="собрать артефакт текущей версии каталога")
+    build_parser.add_argument("--precision", choices=PRECISIONS, default="float32")
+    build_parser.add_argument("--output", type=Path, default=None)
+
+    append_parser = subparsers.add_parser("append", help="добавить новые доклады и опубликовать версию")
+    append_parser.add_argument("new_talks", type=Path, help="CSV с колонками dataset_processed.csv")
+    append_parser.add_argument("--precision", choices=PRECISIONS, nargs="+", default=["float32"])
+    append_parser.add_argument("--ivf", action="store_true", help="собрать и IVF-индекс")
+
+    use_parser = subparsers.add_parser("use", help="переключить текущую версию (например, откат)")
+    use_parser.add_argument("version")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == "build":
+        source_dir = resolve_catalog_dir(args.data_dir)
+        output = args.output or source_dir / catalog_filename(args.precision)
+        version = build_catalog(source_dir, output, precision=args.precision)
+        logger.info(f"✅ Catalog artifact saved to {output} (version {version})")
+
+    elif args.command == "append":
+        append_talks(args.data_dir, args.new_talks, precisions=args.precision, build_ivf=args.ivf)
+
+    elif args.command == "use":
+        set_current(args.data_dir, args.version)
+        logger.info(f"✅ Current catalog: {args.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Офлайн-оценка рекомендателей в матричной форме.
+
+Повторяет метрики ноутбука Lesson 5 (Relevance@5, Diversity, Composite)
+для схемы «доклад → похожие доклады», но считает сходство n×n один раз
+(или блоками для больших n) и метрики для всех запросов сразу.
+
+Команда precision сравнивает хранение каталога в float16/int8 с float32:
+совпадение топ-5 и изменение метрик.
+
+Запуск из каталога app:
+    python -m ml_worker.evaluation evaluate
+    python -m ml_worker.evaluation optimize --trials 50 --n-jobs 4
+    python -m ml_worker.evaluation precision
+"""
+import argparse
+import logging
+import pickle
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from ml_worker.hybrid import FEATURES, HybridScorer, encode_column
+from ml_worker.recommender import DEFAULT_DATA_DIR
+from ml_worker.scoring import PRECISIONS, dequantize, l2_normalize, quantize, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+SBERT_WEIGHTS = {"w_sem": 1.0}
+
+
+class Evaluator:
+    """
+    Считает рекомендации и метрики для всех докладов каталога.
+    Матрица сходства хранится целиком, если в ней не больше max_cached
+    элементов, иначе пересчитывается блоками по block_size запросов.
+
+    precision задаёт точность хранения каталога: запросы остаются float32,
+    как при обслуживании, а сходство считается с квантованным каталогом.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        codes: dict,
+        top_k: int = 5,
+        block_size: int = 2048,
+        max_cached: int = 64_000_000,
+        precision: str = "float32",
+    ):
+        self.embeddings = np.ascontiguousarray(l2_normalize(embeddings))
+        self.catalog_embeddings = dequantize(*quantize(self.embeddings, precision))
+        self.codes = codes
+        self.top_k = top_k
+        self.block_size = block_size
+        n = len(self.embeddings)
+        self._similarity: Optional[np.ndarray] = None
+        if n * n <= max_cached:
+            self._similarity = self.embeddings @ self.catalog_embeddings.T
+
+    @classmethod
+    def from_data_dir(cls, data_dir: Path = DEFAULT_DATA_DIR, **kwargs) -> "Evaluator":
+        data_dir = Path(data_dir)
+        df = pd.read_csv(data_dir / "dataset_processed.csv")
+        embeddings = np.load(data_dir / "sbert_embeddings.npy")
+        codes = {column: encode_column(df[column]) for column in FEATURES}
+        return cls(embeddings, codes, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def _similarity_block(self, start: int, stop: int) -> np.ndarray:
+        if self._similarity is not None:
+            return self._similarity[start:stop]
+        return self.embeddings[start:stop] @ self.catalog_embeddings.T
+
+    def recommend_all(self, weights: dict) -> np.ndarray:
+        """Топ-k для каждого доклада (сам доклад исключён): массив (n, k)."""
+        scorer = HybridScorer(None, self.codes, weights)
+        n = len(self)
+        result = np.empty((n, min(self.top_k, n - 1)), dtype=np.int64)
+        for start in range(0, n, self.block_size):
+            stop = min(start + self.block_size, n)
+            queries = np.arange(start, stop)
+            # Доклад-запрос сам является «якорем» для категориальных признаков
+            scores = scorer.score_from_anchors(self._similarity_block(start, stop), queries)
+            scores[np.arange(stop - start), queries] = -np.inf
+            result[start:stop] = top_k_indices(scores, self.top_k)
+        return result
+
+    def metrics(self, recs: np.ndarray, relevance_weight: float = 0.7) -> dict:
+        n, k = recs.shape
+
+        # Relevance@k: доля рекомендаций из той же категории
+        categories = self.codes["category"]
+        query_categories = categories[:, None]
+        relevant = (categories[recs] == query_categories) & (query_categories >= 0)
+        relevance = relevant.mean(axis=1)
+
+        # Diversity: 1 - среднее попарное сходство рекомендаций
+        if k == 1:
+            diversity = np.ones(n)
+        else:
+            rec_embeddings = self.embeddings[recs]
+            pairwise = np.einsum("nid,njd->nij", rec_embeddings, rec_embeddings)
+            off_diagonal = pairwise.sum(axis=(1, 2)) - np.trace(pairwise, axis1=1, axis2=2)
+            diversity = 1 - off_diagonal / (k * (k - 1))
+
+        avg_rel = float(relevance.mean())
+        avg_div = float(diversity.mean())
+        return {
+            "Relevance@5": avg_rel,
+            "Diversity": avg_div,
+            "Composite": relevance_weight * avg_rel + (1 - relevance_weight) * avg_div,
+        }
+
+    def evaluate(self, weights: dict) -> dict:
+        return self.metrics(self.recommend_all(weights))
+
+
+def format_metrics(model_name: str, metrics: dict) -> dict:
+    return {"Model": model_name, **{key: round(value, 3) for key, value in metrics.items()}}
+
+
+def top_k_overlap(recs: np.ndarray, reference: np.ndarray) -> float:
+    """Средняя доля общих докладов в топ-k двух моделей."""
+    return float((recs[:, :, None] == reference[:, None, :]).any(axis=2).mean())
+
+
+def compare_precisions(data_dir: Path, weights: dict) -> list:
+    """Метрики SBERT и гибрида для каждой точности хранения каталога против float32."""
+    models = [("Sentence-BERT", SBERT_WEIGHTS), ("Hybrid (Optuna-tuned)", weights)]
+    reference = Evaluator.from_data_dir(data_dir)
+    reference_recs = {name: reference.recommend_all(model_weights) for name, model_weights in models}
+
+    results = []
+    for precision in PRECISIONS:
+        evaluator = Evaluator.from_data_dir(data_dir, precision=precision)
+        data, scales = quantize(evaluator.embeddings, precision)
+        size_mb = (data.nbytes + (scales.nbytes if scales is not None else 0)) / 2 ** 20
+        for name, model_weights in models:
+            recs = evaluator.recommend_all(model_weights)
+            results.append({
+                "Precision": precision,
+                **format_metrics(name, evaluator.metrics(recs)),
+                "Top-5 overlap": round(top_k_overlap(recs, reference_recs[name]), 3),
+                "Catalog MB": round(size_mb, 3),
+            })
+    return results
+
+
+def optimize(evaluator: Evaluator, n_trials: int = 50, n_jobs: int = 1, seed: Optional[int] = None):
+    """Подбор весов гибридной модели Optuna; диапазоны как в ноутбуке."""
+    import optuna
+
+    def objective(trial):
+        weights = {
+            "w_sem": trial.suggest_float("w_sem", 0.5, 1.0),
+            "w_cat": trial.suggest_float("w_cat", 0.0, 0.5),
+            "w_speaker": trial.suggest_float("w_speaker", 0.0, 0.3),
+            "w_companies": trial.suggest_float("w_companies", 0.0, 0.3),
+        }
+        return evaluator.evaluate(weights)["Composite"]
+
+    sampler = optuna.samplers.TPESampler(seed=seed)
+    study = optuna.create_study(direction="maximize", sampler=sampler)
+    # Тяжёлая часть — матричные операции numpy, они отпускают GIL,
+    # поэтому испытания параллелятся потоками
+    study.optimize(objective, n_trials=n_trials, n_jobs=n_jobs)
+    return study
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    evaluate_parser = subparsers.add_parser("evaluate", help="метрики SBERT и гибридной модели")
+    evaluate_parser.add_argument("--weights", type=Path, default=None)
+
+    optimize_parser = subparsers.add_parser("optimize", help="подбор весов гибридной модели")
+    optimize_parser.add_argument("--trials", type=int, default=50)
+    optimize_parser.add_argument("--n-jobs", type=int, default=1)
+    optimize_parser.add_argument("--seed", type=int, default=None)
+    optimize_parser.add_argument("--output", type=Path, default=None, help="куда сохранить лучшие веса (.pkl)")
+
+    precision_parser = subparsers.add_parser("precision", help="float16/int8 против float32")
+    precision_parser.add_argument("--weights", type=Path, default=None)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == "precision":
+        with open(args.weights or args.data_dir / "hybrid_weights.pkl", "rb") as f:
+            weights = pickle.load(f)
+        print(pd.DataFrame(compare_precisions(args.data_dir, weights)).to_string(index=False))
+        return
+
+    evaluator = Evaluator.from_data_dir(args.data_dir)
+
+    if args.command == "evaluate":
+        weights_path = args.weights or args.data_dir / "hybrid_weights.pkl"
+        with open(weights_path, "rb") as f:
+            weights = pickle.load(f)
+        results = [
+            format_metrics("Sentence-BERT", evaluator.evaluate(SBERT_WEIGHTS)),
+            format_metrics("Hybrid (Optuna-tuned)", evaluator.evaluate(weights)),
+        ]
+        print(pd.DataFrame(results).to_string(index=False))
+
+    elif args.command == "optimize":
+        study = optimize(evaluator, n_trials=args.trials, n_jobs=args.n_jobs, seed=args.seed)
+        print("Лучшие веса:", study.best_params)
+        print("Лучший Composite Score:", round(study.best_value, 3))
+        if args.output:
+            with open(args.output, "wb") as f:
+                pickle.dump(study.best_params, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import logging
+import pickle
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from ml_worker.scoring import EmbeddingIndex, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+# Категориальные признаки гибридной модели и соответствующие веса из hybrid_weights.pkl
+FEATURES = {
+    "category": "w_cat",
+    "speaker": "w_speaker",
+    "companies": "w_companies",
+}
+
+
+def encode_column(values) -> np.ndarray:
+    """Целочисленные коды значений; пропуски получают -1 и ни с чем не совпадают."""
+    import pandas as pd
+
+    codes, _ = pd.factorize(pd.Series(values))
+    return codes.astype(np.int32)
+
+
+class HybridScorer:
+    """
+    Гибридный скоринг из ноутбука Lesson 5 в векторизованном виде:
+    w_sem * cos + w_cat * [категория совпала] + w_speaker * [спикер совпал]
+    + w_companies * [компании совпали] — за один проход по массивам.
+
+    Для текстового запроса категориальные признаки берутся у «якоря» —
+    доклада, семантически ближайшего к запросу.
+
+    При rerank_depth индекс (например, IVF) отдаёт rerank_depth семантических
+    кандидатов, и гибридная формула пересчитывается только для них.
+    """
+
+    def __init__(self, index: EmbeddingIndex, codes: dict, weights: dict, rerank_depth: Optional[int] = None):
+        self.index = index
+        self.codes = codes
+        self.weights = weights
+        self.rerank_depth = rerank_depth
+
+    @classmethod
+    def load(
+        cls,
+        index: EmbeddingIndex,
+        codes: dict,
+        weights_path: Path,
+        rerank_depth: Optional[int] = None,
+    ) -> "HybridScorer":
+        with open(weights_path, "rb") as f:
+            weights = pickle.load(f)
+        logger.info(f"Hybrid scorer weights: {weights}")
+        return cls(index, codes, weights, rerank_depth=rerank_depth)
+
+    def score_from_anchors(
+        self,
+        semantic: np.ndarray,
+        anchors: np.ndarray,
+        candidates: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Гибридные оценки по семантическим оценкам и индексам докладов-якорей:
+        (batch, n) по всему каталогу или (batch, c) по кандидатам candidates.
+        """
+        scores = self.weights["w_sem"] * semantic
+        for column, weight_name in FEATURES.items():
+            weight = self.weights.get(weight_name, 0.0)
+            if not weight:
+                continue
+            codes = self.codes[column]
+            item_codes = codes[None, :] if candidates is None else codes[candidates]
+            anchor_codes = codes[anchors][:, None]
+            scores += weight * ((item_codes == anchor_codes) & (anchor_codes >= 0))
+        return scores
+
+    def score(self, query_embeddings: np.ndarray) -> np.ndarray:
+        semantic = self.index.score(query_embeddings)
+        return self.score_from_anchors(semantic, semantic.argmax(axis=-1))
+
+    def search(self, query_embeddings: np.ndarray, k: int = 5):
+        if self.rerank_depth is None:
+            scores = self.score(query_embeddings)
+            idxs = top_k_indices(scores, k)
+            return idxs, np.take_along_axis(scores, idxs, axis=-1)
+
+        # Кандидаты отсортированы по сходству, первый из них и есть якорь
+        candidates, semantic = self.index.search(query_embeddings, k=max(k, self.rerank_depth))
+        scores = self.score_from_anchors(semantic, candidates[:, 0], candidates)
+        order = top_k_indices(scores, k)
+        return np.take_along_axis(candidates, order, axis=-1), np.take_along_axis(scores, order, axis=-1)
@@ -2,19 +2,22 @@ import pika
 import json
 import logging
 import os
+import time
 from datetime import datetime
-from pathlib import Path
 
-import pandas as pd
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
+from sqlalchemy import case, insert, update
+from sqlmodel import select
 
 from models.ml_task import MLTask, TaskStatus
 from models.prediction import MLPrediction
-from services.prediction_service import PredictionService
-from services.user_service import UserService
-from database.database import SessionLocal
+from models.user import User
+from services.task_events import notify_task_events
+from database.database import SessionLocal, engine
+from ml_worker import metrics
+from ml_worker.batching import BatchConsumer
+from ml_worker.recommender import Recommender
+from ml_worker.result_cache import ResultCache
+from ml_worker.retry import RetryPolicy
 
 # === Настройка логирования ===
 logging.basicConfig(
@@ -24,17 +27,11 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # === ЗАГРУЗКА РЕКОМЕНДАТЕЛЬНОЙ МОДЕЛИ ===
-BASE_DIR = Path(__file__).parent.parent.parent  # -> MFDP/ML_engineering/Lesson6.MVP
-DATA_DIR = BASE_DIR / "data"
-
-# Загружаем данные докладов
-df = pd.read_csv(DATA_DIR / "dataset_processed.csv")
-sbert_embeddings = np.load(DATA_DIR / "sbert_embeddings.npy")
-
-# Загружаем SBERT-модель для кодирования текста пользователя
-sbert_model = SentenceTransformer(str(DATA_DIR / "sbert_model"))
-
-logger.info(f"✅ Recommender system loaded: {len(df)} presentations")
+# Кэш результатов для одинаковых запросов (ключ учитывает модель и версию каталога)
+recommender = Recommender(cache=ResultCache(
+    maxsize=int(os.getenv("ML_RESULT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("ML_RESULT_CACHE_TTL", "3600")),
+))
 
 # === Параметры RabbitMQ ===
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")
@@ -52,153 +49,290 @@ connection_params = pika.ConnectionParameters(
     blocked_connection_timeout=60
 )
 
-
-def update_task_status(session, task, status, result_id=None):
-    task.status = status
-    task.updated_at = datetime.now()
-    if status == TaskStatus.DONE:
-        task.completed_at = task.updated_at
-    if result_id:
-        task.result_id = result_id
-    session.add(task)
-    session.commit()
-    logger.info(f"Task {task.id} → status={status.value}, result_id={result_id}")
+QUEUE_NAME = 'ml_task'
+# Задачи пакетной постановки (/api/ml/send_tasks): планируются после интерактивных
+BULK_QUEUE_NAME = 'ml_task.bulk'
 
 
-def fail_task(session, task, reason="Unknown error", ch=None, method=None):
-    logger.error(f"Task {task.id} failed: {reason}")
-    update_task_status(session, task, TaskStatus.FAILED)
-    if ch and method:
-        ch.basic_ack(delivery_tag=method.delivery_tag)
-
-
-def callback(ch, method, properties, body):
+def fail_dead_lettered(delivery, reason: str) -> None:
+    """Задача из DLQ помечается FAILED с событием: иначе ждущие её клиенты висят до таймаута."""
+    task_data = json.loads(delivery.body.decode('utf-8'))
+    task_id, user_id = task_data["task_id"], task_data["user_id"]
     session = SessionLocal()
     try:
-        task_data = json.loads(body.decode('utf-8'))
-        task_id = task_data["task_id"]
-        user_id = task_data["user_id"]
-        model_name = task_data["model_name"]
-        input_data = task_data["input_data"]
-
-        logger.info(f"📥 Processing task {task_id} from user {user_id}")
-
-        task = session.get(MLTask, task_id)
-        if not task:
-            logger.error(f"Task {task_id} not found")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
-            return
-
-        if task.status != TaskStatus.PENDING:
+        result = session.execute(
+            update(MLTask)
+            .where(MLTask.id == task_id, MLTask.status == TaskStatus.PENDING)
+            .values(status=TaskStatus.FAILED, updated_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            notify_task_events(session, [
+                {"task_id": task_id, "user_id": user_id, "status": TaskStatus.FAILED.name, "result_id": None}
+            ])
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    logger.error(f"Task {task_id} failed after retries: {reason}")
+
+
+# Повторы с задержкой и DLQ вместо немедленного возврата в очередь
+retry_policy = RetryPolicy([QUEUE_NAME, BULK_QUEUE_NAME], on_dead_letter=fail_dead_lettered)
+metrics.track_pool(engine)
+
+# === Параметры батчинга ===
+# Больше батч — выше пропускная способность, больше ожидание — выше задержка
+BATCH_MAX_SIZE = int(os.getenv("ML_BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = int(os.getenv("ML_BATCH_MAX_WAIT_MS", "50"))
+# Сколько bulk-задач держать в буфере воркера для чередования пользователей
+# и какую долю батча гарантировать bulk-задачам при потоке интерактивных
+BULK_PREFETCH = int(os.getenv("ML_BULK_PREFETCH", str(BATCH_MAX_SIZE * 4)))
+BULK_BATCH_SHARE = float(os.getenv("ML_BULK_BATCH_SHARE", "0.25"))
+
+
+def _parse_delivery(delivery):
+    task_data = json.loads(delivery.body.decode('utf-8'))
+    return {
+        "delivery": delivery,
+        "task_id": task_data["task_id"],
+        "user_id": task_data["user_id"],
+        "model_name": task_data["model_name"],
+        "input_data": task_data["input_data"],
+    }
+
+
+def _claim_tasks(session, items, acks, retries):
+    """
+    Блокирует задачи батча (SELECT ... FOR UPDATE SKIP LOCKED) до коммита.
+    Возвращает задачи для инференса и отклонённые задачи с причиной;
+    сообщения, которые не нужно обрабатывать, раскладывает в acks/retries.
+    """
+    task_ids = {item["task_id"] for item in items}
+    tasks = {
+        task.id: task
+        for task in session.exec(
+            select(MLTask).where(MLTask.id.in_(task_ids)).with_for_update(skip_locked=True)
+        ).all()
+    }
+    user_ids = {item["user_id"] for item in items}
+    users = set(session.exec(select(User.id).where(User.id.in_(user_ids))).all())
+
+    pending, failed, claimed = [], [], set()
+    for item in items:
+        task_id = item["task_id"]
+        logger.info(f"📥 Processing task {task_id} from user {item['user_id']}")
+        task = tasks.get(task_id)
+        if task is None:
+            # Ещё не закоммичена в API или её держит другой воркер — повторим позже
+            retries.append(item["delivery"])
+        elif task_id in claimed:
+            logger.warning(f"Task {task_id}: duplicate delivery in batch")
+            acks.append(item["delivery"])
+        elif task.status != TaskStatus.PENDING:
             logger.warning(f"Task {task_id} already processed ({task.status})")
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            return
-
-        update_task_status(session, task, TaskStatus.PROCESSING)
-
-        # Валидация входных данных
-        if not input_data or not input_data.strip():
-            fail_task(
-                session=session,
-                task=task,
-                reason="Empty input data",
-                ch=ch, method=method
-            )
-            return
-
-        # Получаем пользователя
-        user = UserService(session).get_by_id(user_id)
-        if not user:
-            fail_task(
-                session=session,
-                task=task,
-                reason=f"User {user_id} not found",
-                ch=ch, method=method
-            )
-            return
-
-        # === РЕКОМЕНДАЦИЯ ПО ТЕКСТУ ИНТЕРЕСОВ ПОЛЬЗОВАТЕЛЯ ===
+            acks.append(item["delivery"])
+        else:
+            claimed.add(task_id)
+            item["task"] = task
+            # Валидация входных данных
+            if not item["input_data"] or not item["input_data"].strip():
+                failed.append((item, "Empty input data"))
+            elif item["user_id"] not in users:
+                failed.append((item, f"User {item['user_id']} not found"))
+            else:
+                item["user_interests"] = item["input_data"].strip()
+                pending.append(item)
+    return pending, failed
+
+
+def recommend_items(items):
+    """
+    Рекомендации для подготовленных задач батча, сгруппированных по модели.
+    Ошибка модели возвращается на месте результата и валит только её задачи.
+    """
+    results = [None] * len(items)
+    by_model = {}
+    for i, item in enumerate(items):
+        by_model.setdefault(item["model_name"], []).append(i)
+
+    for model_name, positions in by_model.items():
+        texts = [items[i]["user_interests"] for i in positions]
         try:
-            user_interests = input_data.strip()
-            if not user_interests:
-                raise ValueError("User interests cannot be empty")
-
-            # Кодируем интересы пользователя в вектор
-            user_embedding = sbert_model.encode([user_interests], convert_to_tensor=False)[0]
-
-            # Сравниваем с эмбеддингами докладов
-            scores = cosine_similarity([user_embedding], sbert_embeddings)[0]
-
-            # Берём топ-5
-            top_k = 5
-            top_idxs = np.argsort(-scores)[:top_k]
-
-            # Формируем читаемый результат
-            recommendations = []
-            for idx in top_idxs:
-                rec = df.iloc[idx]
-                recommendations.append({
-                    "title": rec["title"],
-                    "speaker": rec["speaker"],
-                    "category": rec["category"],
-                    "conf": rec["conf"]
-                })
-
-            prediction_result = "\n".join([
-                f"{i+1}. [{rec['category']}] {rec['title']} — {rec['speaker']} ({rec['conf']})"
-                for i, rec in enumerate(recommendations)
-            ])
-
+            model_results = recommender.recommend(texts, model_name)
         except Exception as e:
-            fail_task(
-                session=session,
-                task=task,
-                reason=f"Recommender error: {str(e)}",
-                ch=ch, method=method
+            model_results = [e] * len(positions)
+        for i, result in zip(positions, model_results):
+            results[i] = result
+    return results
+
+
+def _save_results(session, done, failed, catalog_version):
+    """
+    Предсказания — одним многострочным INSERT, статусы задач — одним UPDATE
+    на каждый исход, события — одним NOTIFY. Коммит делает вызывающий.
+    Возвращает время завершения задач (completed_at).
+    """
+    now = datetime.now()
+    prediction_ids = []
+    if done:
+        prediction_ids = list(session.execute(
+            insert(MLPrediction).returning(MLPrediction.id, sort_by_parameter_order=True),
+            [
+                {
+                    "user_id": item["user_id"],
+                    "model_name": item["model_name"],
+                    "prediction_result": "",
+                    "recommendations": recommendations,
+                    "catalog_version": catalog_version,
+                    "timestamp": now,
+                }
+                for item, recommendations in done
+            ],
+        ).scalars())
+        result_ids = {item["task_id"]: prediction_id for (item, _), prediction_id in zip(done, prediction_ids)}
+        session.execute(
+            update(MLTask)
+            .where(MLTask.id.in_(result_ids))
+            .values(
+                status=TaskStatus.DONE,
+                updated_at=now,
+                completed_at=now,
+                result_id=case(result_ids, value=MLTask.id),
             )
-            return
-        # ================================================
-
-        # Сохраняем результат в БД
+            .execution_options(synchronize_session=False)
+        )
+    if failed:
+        session.execute(
+            update(MLTask)
+            .where(MLTask.id.in_([item["task_id"] for item, _ in failed]))
+            .values(status=TaskStatus.FAILED, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+    events = [
+        {"task_id": item["task_id"], "user_id": item["user_id"], "status": TaskStatus.DONE.name, "result_id": prediction_id}
+        for (item, _), prediction_id in zip(done, prediction_ids)
+    ] + [
+        {"task_id": item["task_id"], "user_id": item["user_id"], "status": TaskStatus.FAILED.name, "result_id": None}
+        for item, _ in failed
+    ]
+    notify_task_events(session, events)
+    return now
+
+
+def _observe_tasks(done, failed, started_at, completed_at):
+    for status, outcomes in (("done", done), ("failed", failed)):
+        metrics.TASKS_PROCESSED.labels(status).inc(len(outcomes))
+        for item, _ in outcomes:
+            metrics.TASK_QUEUE_WAIT_SECONDS.observe(max(0.0, (started_at - item["task"].created_at).total_seconds()))
+            metrics.TASK_PROCESSING_SECONDS.observe((completed_at - started_at).total_seconds())
+
+
+def process_batch(ch, deliveries):
+    """
+    Батч задач обрабатывается в одной транзакции: задачи блокируются на время
+    инференса, результаты и статусы пишутся пачкой, а сообщения подтверждаются
+    только после коммита. При ошибке транзакции весь батч уходит на отложенный повтор.
+    """
+    batch_started = time.perf_counter()
+    started_at = datetime.now()
+    metrics.BATCH_SIZE.observe(len(deliveries))
+
+    # Новая версия каталога подхватывается только между батчами
+    recommender.maybe_reload()
+    catalog_version = recommender.version
+
+    items, acks, retries = [], [], []
+    for delivery in deliveries:
         try:
-            prediction = PredictionService(session).add_prediction(
-                MLPrediction(
-                    user_id=user_id,
-                    model_name=model_name,
-                    prediction_result=prediction_result
-                )
-            )
-            update_task_status(session, task, TaskStatus.DONE, result_id=prediction.id)
-            logger.info(f"✅ Task {task_id} completed. Sample: {prediction_result.splitlines()[0][:60]}...")
-
+            items.append(_parse_delivery(delivery))
         except Exception as e:
-            fail_task(
-                session=session,
-                task=task,
-                reason=f"Failed to save prediction: {str(e)}",
-                ch=ch, method=method
-            )
-            return
+            # Сообщение не разобрать и при повторе — не возвращаем его в очередь
+            logger.error(f"💥 Malformed task message: {e}")
+            acks.append(delivery)
 
-        # Успешно — подтверждаем обработку в RabbitMQ
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+    session = SessionLocal()
+    try:
+        with metrics.STAGE_SECONDS.labels("claim").time():
+            pending, failed = _claim_tasks(session, items, acks, retries)
+
+        # === РЕКОМЕНДАЦИЯ ПО ТЕКСТУ ИНТЕРЕСОВ ПОЛЬЗОВАТЕЛЕЙ ===
+        done = []
+        if pending:
+            try:
+                results = recommend_items(pending)
+            except Exception as e:
+                results = [e] * len(pending)
+            for item, recommendations in zip(pending, results):
+                if isinstance(recommendations, Exception):
+                    failed.append((item, f"Recommender error: {str(recommendations)}"))
+                else:
+                    done.append((item, recommendations))
+        # ================================================
 
+        with metrics.STAGE_SECONDS.labels("save").time():
+            completed_at = _save_results(session, done, failed, catalog_version)
+        with metrics.STAGE_SECONDS.labels("commit").time():
+            session.commit()
     except Exception as e:
-        logger.error(f"💥 Unexpected error in worker: {e}")
-        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        logger.error(f"💥 Unexpected error in worker, retrying {len(items)} tasks later: {e}")
+        session.rollback()
+        for delivery in acks:
+            ch.basic_ack(delivery_tag=delivery.method.delivery_tag)
+        for item in items:
+            if item["delivery"] not in acks:
+                retry_policy.retry(ch, item["delivery"], f"Unexpected error: {e}")
+        return
     finally:
         session.close()
 
+    _observe_tasks(done, failed, started_at, completed_at)
+    for item, reason in failed:
+        logger.error(f"Task {item['task_id']} failed: {reason}")
+    for item, recommendations in done:
+        logger.info(f"✅ Task {item['task_id']} completed. Top talks: {[talk_id for talk_id, _ in recommendations]}")
+
+    # Подтверждаем только после коммита: при падении до него задачи вернутся в очередь
+    with metrics.STAGE_SECONDS.labels("ack").time():
+        for delivery in acks + [item["delivery"] for item, _ in done + failed]:
+            ch.basic_ack(delivery_tag=delivery.method.delivery_tag)
+        for delivery in retries:
+            retry_policy.retry(ch, delivery, "Task not found or locked by another worker")
+    metrics.STAGE_SECONDS.labels("batch").observe(time.perf_counter() - batch_started)
+    logger.info(
+        f"Batch committed: {len(done)} done, {len(failed)} failed. "
+        f"Result cache: {recommender.cache.stats()}, retries: {retry_policy.stats()}"
+    )
+
+
+def consume(handler=process_batch):
+    """Подключается к RabbitMQ и обрабатывает очередь ml_task батчами (блокирующий вызов)."""
+    connection = pika.BlockingConnection(connection_params)
+    consumer = BatchConsumer(
+        connection,
+        queue=QUEUE_NAME,
+        handler=handler,
+        max_batch=BATCH_MAX_SIZE,
+        max_wait=BATCH_MAX_WAIT_MS / 1000,
+        bulk_queue=BULK_QUEUE_NAME,
+        bulk_prefetch=BULK_PREFETCH,
+        bulk_share=BULK_BATCH_SHARE,
+    )
+    retry_policy.declare(consumer.channel)
+    logger.info(
+        f"🧠 ML Worker ready (batch<={BATCH_MAX_SIZE}, wait<={BATCH_MAX_WAIT_MS} ms). Waiting for tasks..."
+    )
+    consumer.start_consuming()
+
 
 if __name__ == "__main__":
     try:
         logger.info("🚀 Starting ML Worker...")
-        connection = pika.BlockingConnection(connection_params)
-        channel = connection.channel()
-        channel.queue_declare(queue='ml_task', durable=True)
-        channel.basic_consume(queue='ml_task', on_message_callback=callback, auto_ack=False)
-        logger.info("🧠 ML Worker ready. Waiting for tasks...")
-        channel.start_consuming()
+        metrics.start_metrics_server()
+        consume()
     except Exception as e:
         logger.critical(f"❌ Worker failed to start: {e}")
-        exit(1)
\ No newline at end of file
+        exit(1)
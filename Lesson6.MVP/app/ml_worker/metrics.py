@@ -0,0 +1,79 @@
+"""
+Метрики Prometheus воркера и модели рекомендаций.
+
+Стадии батча (ml_stage_seconds): claim — блокировка задач в БД,
+encode / search — кодирование запросов и поиск по каталогу, save — запись
+результатов, commit, ack — подтверждения и повторы в RabbitMQ, batch — весь
+батч. Время задачи: created_at → начало обработки (queue_wait) и начало
+обработки → completed_at (processing).
+
+Модель работает и в процессе API (синхронный /recommend): там эти же
+метрики отдаются на /metrics API. Пул воркеров (supervisor.py) собирает
+метрики процессов через PROMETHEUS_MULTIPROC_DIR и отдаёт их на ML_METRICS_PORT.
+"""
+import logging
+import os
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+
+logger = logging.getLogger(__name__)
+
+# Порт /metrics воркера; 0 — не поднимать
+METRICS_PORT = int(os.getenv("ML_METRICS_PORT", "9100"))
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+STAGE_SECONDS = Histogram(
+    "ml_stage_seconds", "Duration of batch processing stages", ["stage"], buckets=STAGE_BUCKETS,
+)
+BATCH_SIZE = Histogram(
+    "ml_batch_size", "Messages per worker batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+TASK_QUEUE_WAIT_SECONDS = Histogram(
+    "ml_task_queue_wait_seconds", "Time from task created_at to processing start", buckets=TASK_BUCKETS,
+)
+TASK_PROCESSING_SECONDS = Histogram(
+    "ml_task_processing_seconds", "Time from processing start to task completed_at", buckets=TASK_BUCKETS,
+)
+TASKS_PROCESSED = Counter("ml_worker_tasks", "Tasks finished by workers", ["status"])
+MESSAGES_RETRIED = Counter("ml_worker_retries", "Messages sent to a retry queue or the DLQ", ["outcome"])
+RESULT_CACHE = Counter("ml_result_cache_lookups", "Result cache lookups", ["result"])
+DB_POOL_IN_USE = Gauge(
+    "ml_worker_db_pool_connections_in_use", "Connections checked out from the worker DB pool",
+    multiprocess_mode="livesum",
+)
+
+
+def track_pool(engine) -> None:
+    """Считает соединения пула, выданные процессу (события checkout / checkin)."""
+    from sqlalchemy import event
+
+    event.listen(engine, "checkout", lambda *args: DB_POOL_IN_USE.inc())
+    event.listen(engine, "checkin", lambda *args: DB_POOL_IN_USE.dec())
+
+
+def mark_process_dead(pid: int) -> None:
+    """Убирает gauge-значения завершившегося процесса пула (счётчики и гистограммы остаются)."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> None:
+    """Поднимает /metrics воркера; в пуле процессов — по файлам всех процессов."""
+    if port <= 0:
+        return
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, registry=registry)
+    logger.info(f"📈 Metrics available on :{port}/metrics")
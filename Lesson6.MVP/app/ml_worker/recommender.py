@@ -0,0 +1,173 @@
+import logging
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from ml_worker.ann import IVFIndex, index_path_for
+from ml_worker.catalog import Catalog, resolve_catalog_dir
+from ml_worker.hybrid import HybridScorer
+from ml_worker.metrics import RESULT_CACHE, STAGE_SECONDS
+from ml_worker.result_cache import ResultCache, cache_key
+from ml_worker.scoring import EmbeddingIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_DIR = Path(__file__).parent.parent.parent / "data"  # -> MFDP/ML_engineering/Lesson6.MVP/data
+
+# Тип индекса: exact — полный перебор, ivf — приближённый поиск (python -m ml_worker.ann build)
+INDEX_TYPE = os.getenv("ML_INDEX", "exact")
+ANN_NPROBE = int(os.getenv("ML_ANN_NPROBE", "8"))
+# Сколько кандидатов ANN-индекса пересчитывает гибридная модель
+HYBRID_RERANK_DEPTH = int(os.getenv("ML_HYBRID_RERANK_DEPTH", "100"))
+# Точность хранения эмбеддингов каталога: float32, float16 или int8
+EMBEDDING_PRECISION = os.getenv("ML_EMBEDDING_PRECISION", "float32")
+# Как часто проверять data/catalogs/CURRENT на смену версии (сек)
+CATALOG_RELOAD_INTERVAL = float(os.getenv("ML_CATALOG_RELOAD_INTERVAL", "10"))
+
+
+def load_index(catalog: Catalog, catalog_dir: Path):
+    if INDEX_TYPE == "ivf":
+        return IVFIndex.load(index_path_for(catalog_dir / "sbert_embeddings.npy"), nprobe=ANN_NPROBE)
+    if INDEX_TYPE != "exact":
+        raise ValueError(f"Unknown ML_INDEX: {INDEX_TYPE}")
+    # Эмбеддинги в артефакте уже нормированы
+    return EmbeddingIndex(catalog.embeddings, catalog.version, scales=catalog.embedding_scales)
+
+
+class CatalogState:
+    """
+    Каталог, индекс и скореры одной версии. При перезагрузке заменяется
+    целиком, поэтому каждый запрос видит согласованный набор.
+    """
+
+    def __init__(self, catalog_dir: Path, weights_path: Path):
+        self.catalog_dir = catalog_dir
+        self.catalog = Catalog.load(catalog_dir, precision=EMBEDDING_PRECISION)
+        self.index = load_index(self.catalog, catalog_dir)
+        # Скореры по model_name: чистое SBERT-сходство и гибрид с весами Optuna
+        self.scorers = {
+            "jug_recommender": self.index,
+            "jug_hybrid": HybridScorer.load(
+                self.index,
+                self.catalog.codes,
+                weights_path,
+                rerank_depth=HYBRID_RERANK_DEPTH if isinstance(self.index, IVFIndex) else None,
+            ),
+        }
+
+    @property
+    def version(self) -> str:
+        # Имя версии (v0002 или base для исходной раскладки) + хеш содержимого каталога
+        # (по нему API проверяет, что рендерит результат тем же каталогом);
+        # у IVF-индекса своя версия — она тоже меняет выдачу
+        name = self.catalog_dir.name if self.catalog_dir.parent.name == "catalogs" else "base"
+        version = f"{name}-{self.catalog.version}"
+        if self.index.version != self.catalog.version:
+            version = f"{version}-{self.index.version}"
+        return version
+
+
+class Recommender:
+    """
+    Рекомендатель докладов: SBERT-кодирование запросов + скоринг по каталогу.
+    Используется ML-воркером и синхронным эндпоинтом API.
+    """
+
+    def __init__(self, data_dir: Path = DEFAULT_DATA_DIR, cache: Optional[ResultCache] = None):
+        # Импорт здесь: torch тяжёлый, а модуль импортируется и там, где модель не нужна
+        from sentence_transformers import SentenceTransformer
+
+        self.data_dir = Path(data_dir)
+        # Загружаем каталог докладов (python -m ml_worker.catalog build / append)
+        self.state = CatalogState(resolve_catalog_dir(self.data_dir), self.data_dir / "hybrid_weights.pkl")
+        self._reload_checked_at = time.monotonic()
+        # Загружаем SBERT-модель для кодирования текста пользователя
+        self.model = SentenceTransformer(str(self.data_dir / "sbert_model"))
+        self.cache = cache if cache is not None else ResultCache(maxsize=0)
+
+        logger.info(f"✅ Recommender system loaded: {len(self.state.catalog)} presentations ({self.version})")
+
+    @property
+    def version(self) -> str:
+        return self.state.version
+
+    def maybe_reload(self, min_interval: float = CATALOG_RELOAD_INTERVAL) -> bool:
+        """
+        Переключается на новую версию каталога, если CURRENT изменился.
+        Вызывается между батчами: новая версия загружается целиком
+        и подменяется одним присваиванием.
+        """
+        now = time.monotonic()
+        if now - self._reload_checked_at < min_interval:
+            return False
+        self._reload_checked_at = now
+
+        catalog_dir = resolve_catalog_dir(self.data_dir)
+        if catalog_dir == self.state.catalog_dir:
+            return False
+        try:
+            state = CatalogState(catalog_dir, self.data_dir / "hybrid_weights.pkl")
+        except Exception as e:
+            logger.error(f"Catalog reload from {catalog_dir} failed, keeping {self.version}: {e}")
+            return False
+
+        previous = self.version
+        self.state = state
+        logger.info(f"🔄 Catalog reloaded: {previous} → {self.version} ({len(state.catalog)} presentations)")
+        return True
+
+    def recommend_batch(
+        self,
+        texts: List[str],
+        model_name: str = "jug_recommender",
+        top_k: int = 5,
+        state: Optional[CatalogState] = None,
+    ) -> List[list]:
+        """
+        Рекомендации для нескольких запросов: один вызов encode и одно матричное умножение.
+        Результат запроса — [[talk_id, score], ...], talk_id — номер доклада в каталоге.
+        """
+        state = state or self.state
+        scorer = state.scorers.get(model_name)
+        if scorer is None:
+            raise ValueError(f"Unknown model: {model_name}")
+
+        # Кодируем интересы пользователей в векторы
+        with STAGE_SECONDS.labels("encode").time():
+            user_embeddings = self.model.encode(texts, batch_size=len(texts), convert_to_tensor=False)
+
+        # Сравниваем с эмбеддингами докладов и берём топ-k для каждого запроса
+        with STAGE_SECONDS.labels("search").time():
+            top_idxs_batch, top_scores_batch = scorer.search(user_embeddings, k=top_k)
+
+        # Текст и поля докладов подставляются при чтении (Catalog.render / describe)
+        return [
+            [[int(idx), round(float(score), 4)] for idx, score in zip(top_idxs, top_scores)]
+            for top_idxs, top_scores in zip(top_idxs_batch, top_scores_batch)
+        ]
+
+    def recommend(self, texts: List[str], model_name: str, state: Optional[CatalogState] = None) -> List[list]:
+        """Берёт готовые результаты из кэша, считает только промахи."""
+        state = state or self.state
+        keys = [cache_key(model_name, state.version, text) for text in texts]
+        results = [self.cache.get(key) for key in keys]
+        misses = results.count(None)
+        RESULT_CACHE.labels("hit").inc(len(results) - misses)
+        RESULT_CACHE.labels("miss").inc(misses)
+
+        # Одинаковые запросы внутри батча кодируем один раз
+        to_compute = {}
+        for text, key, result in zip(texts, keys, results):
+            if result is None and key not in to_compute:
+                to_compute[key] = text
+
+        if to_compute:
+            computed = dict(zip(to_compute, self.recommend_batch(list(to_compute.values()), model_name, state=state)))
+            for key, value in computed.items():
+                self.cache.put(key, value)
+            results = [
+                result if result is not None else computed[key]
+                for key, result in zip(keys, results)
+            ]
+        return results
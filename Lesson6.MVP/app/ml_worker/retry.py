@@ -0,0 +1,117 @@
+import logging
+import os
+from typing import Callable, Optional
+
+import pika
+
+from ml_worker.metrics import MESSAGES_RETRIED
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз сообщение возвращается в очередь до отправки в DLQ
+MAX_RETRIES = int(os.getenv("ML_MAX_RETRIES", "5"))
+# Задержка перед повтором: base * 2^(номер повтора), не больше max
+RETRY_BASE_DELAY_MS = int(os.getenv("ML_RETRY_BASE_DELAY_MS", "1000"))
+RETRY_MAX_DELAY_MS = int(os.getenv("ML_RETRY_MAX_DELAY_MS", "60000"))
+
+RETRY_HEADER = "x-retry-count"
+ERROR_HEADER = "x-last-error"
+
+
+class RetryPolicy:
+    """
+    Отложенные повторы вместо basic_nack(requeue=True).
+
+    Сообщение публикуется заново в очередь задержки <queue>.retry.<мс> с TTL,
+    по истечении которого брокер возвращает его в исходную очередь
+    (dead-letter на default exchange). Число повторов хранится в заголовке
+    x-retry-count; после MAX_RETRIES сообщение уходит в <первая очередь>.dlq.
+    У каждой задержки своя очередь: при TTL на очередь сообщения истекают
+    по порядку и не ждут друг друга.
+
+    on_dead_letter(delivery, reason) вызывается после отправки в DLQ, чтобы
+    задача не осталась в ожидании навсегда; его ошибки только логируются.
+    """
+
+    def __init__(
+        self,
+        queues: list,
+        max_retries: int = MAX_RETRIES,
+        base_delay_ms: int = RETRY_BASE_DELAY_MS,
+        max_delay_ms: int = RETRY_MAX_DELAY_MS,
+        on_dead_letter: Optional[Callable[[object, str], None]] = None,
+    ):
+        self.queues = list(queues)
+        self.max_retries = max_retries
+        self.base_delay_ms = base_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.dead_letter_queue = f"{self.queues[0]}.dlq"
+        self.on_dead_letter = on_dead_letter
+        self.retried = 0
+        self.dead_lettered = 0
+
+    def delay_ms(self, retry: int) -> int:
+        return min(self.base_delay_ms * 2 ** retry, self.max_delay_ms)
+
+    def delay_queue(self, queue: str, delay_ms: int) -> str:
+        return f"{queue}.retry.{delay_ms}"
+
+    def declare(self, channel) -> None:
+        for queue in self.queues:
+            for delay_ms in sorted({self.delay_ms(retry) for retry in range(self.max_retries)}):
+                channel.queue_declare(
+                    queue=self.delay_queue(queue, delay_ms),
+                    durable=True,
+                    arguments={
+                        "x-message-ttl": delay_ms,
+                        "x-dead-letter-exchange": "",
+                        "x-dead-letter-routing-key": queue,
+                    },
+                )
+        channel.queue_declare(queue=self.dead_letter_queue, durable=True)
+
+    def retry(self, channel, delivery, reason: str) -> None:
+        """Откладывает повтор сообщения (или отправляет его в DLQ) и подтверждает исходное."""
+        properties = delivery.properties
+        headers = dict(getattr(properties, "headers", None) or {})
+        retries = int(headers.get(RETRY_HEADER, 0))
+        headers[RETRY_HEADER] = retries + 1
+        headers[ERROR_HEADER] = reason[:500]
+
+        dead_letter = retries >= self.max_retries
+        if dead_letter:
+            routing_key = self.dead_letter_queue
+            self.dead_lettered += 1
+            MESSAGES_RETRIED.labels("dead_lettered").inc()
+            logger.error(f"☠️ Message moved to {routing_key} after {retries} retries: {reason}")
+        else:
+            # Повтор возвращается в ту очередь, из которой пришло сообщение
+            queue = getattr(delivery.method, "routing_key", None)
+            delay_ms = self.delay_ms(retries)
+            routing_key = self.delay_queue(queue if queue in self.queues else self.queues[0], delay_ms)
+            self.retried += 1
+            MESSAGES_RETRIED.labels("retried").inc()
+            logger.warning(f"Message retry {retries + 1}/{self.max_retries} in {delay_ms} ms: {reason}")
+
+        channel.basic_publish(
+            exchange="",
+            routing_key=routing_key,
+            body=delivery.body,
+            properties=pika.BasicProperties(
+                delivery_mode=pika.DeliveryMode.Persistent,
+                content_type=getattr(properties, "content_type", None),
+                headers=headers,
+            ),
+        )
+        # Подтверждаем после публикации: при падении между ними сообщение
+        # придёт повторно, а уже выполненную задачу воркер просто пропустит
+        channel.basic_ack(delivery_tag=delivery.method.delivery_tag)
+
+        if dead_letter and self.on_dead_letter is not None:
+            try:
+                self.on_dead_letter(delivery, reason)
+            except Exception as e:
+                logger.error(f"Dead-letter handler failed: {e}")
+
+    def stats(self) -> dict:
+        return {"retried": self.retried, "dead_lettered": self.dead_lettered}
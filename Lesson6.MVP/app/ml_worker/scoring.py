@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+PRECISIONS = ("float32", "float16", "int8")
+
+
+def quantize(matrix: np.ndarray, precision: str):
+    """
+    Сжатое хранение эмбеддингов: (данные, масштабы строк или None).
+    int8 — симметричное квантование с отдельным масштабом на строку.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if precision == "float32":
+        return matrix, None
+    if precision == "float16":
+        return matrix.astype(np.float16), None
+    if precision == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        data = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return data, scales.astype(np.float32)
+    raise ValueError(f"Unknown precision: {precision}")
+
+
+def dequantize(data: np.ndarray, scales=None) -> np.ndarray:
+    matrix = data.astype(np.float32)
+    if scales is not None:
+        matrix *= scales[:, None]
+    return matrix
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Индексы k лучших значений по последней оси, отсортированные по убыванию.
+    argpartition выбирает кандидатов за O(n), сортируются только k элементов.
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k == n:
+        return np.argsort(-scores, axis=-1)
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    part_scores = np.take_along_axis(scores, part, axis=-1)
+    order = np.argsort(-part_scores, axis=-1)
+    return np.take_along_axis(part, order, axis=-1)
+
+
+class EmbeddingIndex:
+    """
+    Каталог эмбеддингов докладов, L2-нормированный один раз при загрузке.
+
+    Нормированная копия хранится рядом с исходным файлом
+    (<name>.normalized.npy) и открывается через memory-map только на чтение,
+    поэтому косинусное сходство — это одно скалярное произведение.
+
+    Эмбеддинги могут храниться в float16 или int8 с масштабом на строку
+    (scales): тогда каталог переводится в float32 блоками по block_size строк.
+    """
+
+    def __init__(self, embeddings: np.ndarray, version: str, scales=None, block_size: int = 1024):
+        self.embeddings = embeddings
+        self.version = version
+        self.scales = scales
+        self.block_size = block_size
+
+    @classmethod
+    def load(cls, path: Path) -> "EmbeddingIndex":
+        path = Path(path)
+        normalized_path = path.with_name(f"{path.stem}.normalized.npy")
+
+        stat = path.stat()
+        version = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:12]
+
+        if not normalized_path.exists() or normalized_path.stat().st_mtime_ns < stat.st_mtime_ns:
+            logger.info(f"Building normalized embeddings: {normalized_path}")
+            normalized = np.ascontiguousarray(l2_normalize(np.load(path)))
+            # Уникальный временный файл и атомарное переименование: процессы
+            # разных контейнеров (у всех PID 1) не пишут в один файл и не видят недописанный
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{normalized_path.name}.", suffix=".tmp", dir=path.parent)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, normalized)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, normalized_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+        embeddings = np.load(normalized_path, mmap_mode="r")
+        return cls(embeddings, version)
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    def score(self, query_embeddings: np.ndarray) -> np.ndarray:
+        """Косинусное сходство запросов (batch, dim) со всем каталогом: (batch, n)."""
+        queries = l2_normalize(np.atleast_2d(query_embeddings))
+        if self.embeddings.dtype == np.float32:
+            return queries @ self.embeddings.T
+
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            block = self.embeddings[start:start + self.block_size].astype(np.float32)
+            scores[:, start:start + self.block_size] = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def search(self, query_embeddings: np.ndarray, k: int = 5):
+        scores = self.score(query_embeddings)
+        idxs = top_k_indices(scores, k)
+        return idxs, np.take_along_axis(scores, idxs, axis=-1)
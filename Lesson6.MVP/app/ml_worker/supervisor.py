@@ -0,0 +1,167 @@
+"""
+Пул ML-воркеров с общей копией модели и каталога.
+
+Супервизор один раз загружает SBERT и каталог (импорт ml_worker.main),
+затем форкает ML_WORKER_PROCESSES процессов-потребителей. Веса модели
+делятся между ними copy-on-write, каталог — через общий memory-map.
+Упавшие процессы перезапускаются, суммарная пропускная способность
+периодически пишется в лог. Метрики всех процессов отдаются на
+ML_METRICS_PORT (/metrics).
+
+Запуск (PYTHONPATH=/app):
+    python ml_worker/supervisor.py
+"""
+import gc
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import time
+
+# prometheus_client выбирает хранилище метрик при импорте: каталог для файлов
+# метрик процессов задаётся до импорта воркера, файлы прошлого запуска удаляются
+METRICS_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/ml_worker_metrics")
+shutil.rmtree(METRICS_DIR, ignore_errors=True)
+os.makedirs(METRICS_DIR, exist_ok=True)
+
+from ml_worker import main as worker  # noqa: E402
+from ml_worker import metrics  # noqa: E402
+from database.database import engine  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+WORKER_PROCESSES = int(os.getenv("ML_WORKER_PROCESSES", str(os.cpu_count() or 1)))
+# Потоков torch на процесс: по умолчанию процессы не конкурируют за ядра
+TORCH_THREADS = int(os.getenv("ML_TORCH_THREADS", "1"))
+REPORT_INTERVAL = float(os.getenv("ML_WORKER_REPORT_INTERVAL", "60"))
+# Если процесс упал быстрее, чем за это время, перезапуск откладывается (до RESTART_MAX_DELAY)
+RESTART_MIN_UPTIME = 10.0
+RESTART_MAX_DELAY = 30.0
+
+
+def _child(slot: int, processed, retried, dead_lettered) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # Пул соединений родителя не должен использоваться после fork
+    engine.dispose(close=False)
+    try:
+        import torch
+        torch.set_num_threads(TORCH_THREADS)
+    except ImportError:
+        pass
+
+    def handler(ch, deliveries):
+        before = worker.retry_policy.stats()
+        try:
+            worker.process_batch(ch, deliveries)
+        finally:
+            after = worker.retry_policy.stats()
+            for counter, value in (
+                (processed, len(deliveries)),
+                (retried, after["retried"] - before["retried"]),
+                (dead_lettered, after["dead_lettered"] - before["dead_lettered"]),
+            ):
+                with counter.get_lock():
+                    counter.value += value
+
+    logger.info(f"🧠 Worker process {slot} started (pid={os.getpid()})")
+    try:
+        worker.consume(handler)
+    except Exception as e:
+        logger.critical(f"❌ Worker process {slot} crashed: {e}")
+        raise SystemExit(1)
+
+
+class Supervisor:
+    def __init__(self, processes: int):
+        self.processes = processes
+        self.context = multiprocessing.get_context("fork")
+        self.processed = self.context.Value("Q", 0)
+        self.retried = self.context.Value("Q", 0)
+        self.dead_lettered = self.context.Value("Q", 0)
+        self.children = {}
+        self.started_at = {}
+        self.restart_delay = {}
+        self.restart_at = {}
+        self._stopping = False
+
+    def _spawn(self, slot: int) -> None:
+        process = self.context.Process(
+            target=_child, args=(slot, self.processed, self.retried, self.dead_lettered), name=f"ml-worker-{slot}", daemon=False,
+        )
+        process.start()
+        self.children[slot] = process
+        self.started_at[slot] = time.monotonic()
+
+    def _check_children(self) -> None:
+        now = time.monotonic()
+        for slot, process in list(self.children.items()):
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                process.join()
+                metrics.mark_process_dead(process.pid)
+                uptime = now - self.started_at[slot]
+                # Частые падения подряд — увеличиваем паузу перед перезапуском
+                delay = 0.0 if uptime >= RESTART_MIN_UPTIME else min(
+                    max(1.0, self.restart_delay.get(slot, 0.0) * 2), RESTART_MAX_DELAY
+                )
+                self.restart_delay[slot] = delay
+                self.restart_at[slot] = now + delay
+                self.children[slot] = None
+                logger.warning(
+                    f"Worker process {slot} exited with code {process.exitcode}, restarting in {delay:.0f} s"
+                )
+            if now >= self.restart_at.get(slot, 0.0):
+                self._spawn(slot)
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        # Объекты, созданные при загрузке, не трогаем сборщиком мусора в детях:
+        # иначе страницы с ними копируются при первом же проходе gc
+        gc.freeze()
+        metrics.start_metrics_server()
+        for slot in range(self.processes):
+            self._spawn(slot)
+
+        cores = min(self.processes, os.cpu_count() or 1)
+        last_report, last_processed = time.monotonic(), 0
+        while True:
+            time.sleep(1.0)
+            if self._stopping:
+                break
+            self._check_children()
+
+            now = time.monotonic()
+            if now - last_report >= REPORT_INTERVAL:
+                processed = self.processed.value
+                rate = (processed - last_processed) / (now - last_report)
+                logger.info(
+                    f"📊 Throughput: {rate:.1f} tasks/s total, {rate / cores:.1f} tasks/s per core "
+                    f"({self.processes} processes, {cores} cores, {processed} tasks since start; "
+                    f"{self.retried.value} retried, {self.dead_lettered.value} dead-lettered)"
+                )
+                last_report, last_processed = now, processed
+
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        logger.info("Stopping worker processes...")
+        for process in self.children.values():
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self.children.values():
+            if process is not None:
+                process.join(timeout=10)
+
+
+if __name__ == "__main__":
+    logger.info(f"🚀 Starting ML worker pool: {WORKER_PROCESSES} processes, {TORCH_THREADS} torch threads each")
+    Supervisor(WORKER_PROCESSES).run()
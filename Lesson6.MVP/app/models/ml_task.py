@@ -1,5 +1,6 @@
 from enum import Enum
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional
 from pydantic import BaseModel
@@ -11,6 +12,13 @@ class TaskStatus(str, Enum):
     FAILED = "ошибка"
 
 class MLTask(SQLModel, table=True):
+    __table_args__ = (
+        # История пользователя: WHERE user_id = ? ORDER BY created_at
+        Index("ix_mltask_user_id_created_at", "user_id", "created_at"),
+        # Очередь/мониторинг: WHERE status = ? ORDER BY created_at
+        Index("ix_mltask_status_created_at", "status", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     model_name: str
@@ -1,12 +1,23 @@
 from datetime import datetime
+from sqlalchemy import Column, Index, JSON
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional
 
 class MLPrediction(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_mlprediction_user_id_timestamp", "user_id", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     model_name: str
+    # Текст ответа хранится у записей, созданных до структурированного вида
+    # (отдаётся, если их каталог недоступен или изменился); у новых результатов он пустой
     prediction_result: str = ""
+    # Рекомендации: [[talk_id, score], ...], текст подставляется из каталога при чтении
+    recommendations: Optional[list] = Field(default=None, sa_column=Column(JSON(none_as_null=True)))
+    # Версия каталога докладов, по которой посчитан результат
+    catalog_version: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.now)
 
     user: Optional["User"] = Relationship(back_populates="predictions")
\ No newline at end of file
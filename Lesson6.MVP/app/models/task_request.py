@@ -1,5 +1,9 @@
+from typing import List
 from pydantic import BaseModel, Field
 
+# Максимум задач в одном запросе /api/ml/send_tasks
+MAX_BULK_TASKS = 1000
+
 class TaskRequest(BaseModel):
     input_data: str = Field(
         ..., 
@@ -8,3 +12,14 @@ class TaskRequest(BaseModel):
         description="Ваши интересы (например: 'люблю LLM и архитектуру')"
     )
     model_name: str = "jug_recommender"  
+
+
+class BulkTaskItem(BaseModel):
+    # Длина и модель проверяются для каждого элемента отдельно: ошибка одного
+    # не отклоняет весь запрос
+    input_data: str
+    model_name: str = "jug_recommender"
+
+
+class BulkTaskRequest(BaseModel):
+    tasks: List[BulkTaskItem] = Field(..., min_length=1, max_length=MAX_BULK_TASKS)
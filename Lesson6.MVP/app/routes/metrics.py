@@ -0,0 +1,26 @@
+import logging
+
+from fastapi import APIRouter, Depends, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from database.database import get_async_session
+from services.metrics import update_task_status_counts
+
+logger = logging.getLogger(__name__)
+
+metrics_route = APIRouter()
+
+
+@metrics_route.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    description="Request latency, ML stage timings, task status counts and DB pool usage",
+    include_in_schema=False,
+)
+async def metrics(session=Depends(get_async_session)) -> Response:
+    try:
+        await update_task_status_counts(session)
+    except Exception as e:
+        # Без БД отдаём остальные метрики
+        logger.warning(f"Task status counts unavailable: {e}")
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,54 +1,99 @@
-from fastapi import APIRouter, HTTPException, Depends
-from database.database import get_session
-from models.task_request import TaskRequest
-from services.ml_task_service import MLTaskService
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Response
+from fastapi.concurrency import run_in_threadpool
+from database.database import get_async_session, AsyncSessionLocal
+from models.task_request import TaskRequest, BulkTaskRequest
+from services.ml_task_service import AsyncMLTaskService
+from services.inline_recommender import get_recommender, INLINE_MAX_QUEUE_DEPTH
+from services.result_renderer import render_result
+from services.admission import AdmissionRejected, get_admission_controller
 from auth.authenticate import get_current_user
 from models.user import User
+from typing import Optional
 import logging
+import math
 
 ml_route = APIRouter()
 logger = logging.getLogger(__name__)
 
-@ml_route.post("/send_task", status_code=201)
-async def new_request(
-    request: TaskRequest,
-    current_user: User = Depends(get_current_user),  # получаем из токена
-    session=Depends(get_session)
-):
+# jug_recommender — SBERT-сходство, jug_hybrid — SBERT + совпадение категории/спикера/компаний
+ALLOWED_MODELS = ["jug_recommender", "jug_hybrid"]
+
+
+def _validation_error(input_data: str, model_name: str) -> Optional[str]:
+    # Проверяем input_data
+    if not input_data.strip():
+        return "Input data cannot be empty or whitespace"
+
+    # Проверяем длину
+    if len(input_data) > 1000:
+        return "Input data too long (max 1000 characters)"
+
+    # Проверяем модель 
+    if model_name not in ALLOWED_MODELS:
+        return f"Model not supported. Use one of: {ALLOWED_MODELS}"
+    return None
+
+
+def _validate_request(request: TaskRequest) -> None:
+    error = _validation_error(request.input_data, request.model_name)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+
+async def _queue_depth(bulk: bool = False) -> Optional[int]:
     try:
-        actual_user_id = current_user.id
-
-        # Проверяем input_data
-        if not request.input_data.strip():
-            raise HTTPException(status_code=400, detail="Input data cannot be empty or whitespace")
-
-        # Проверяем длину
-        if len(request.input_data) > 1000:
-            raise HTTPException(status_code=400, detail="Input data too long (max 1000 characters)")
-
-        # Проверяем модель 
-        allowed_models = ["jug_recommender"]
-        if request.model_name not in allowed_models:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Model not supported. Use one of: {allowed_models}"
-            )
+        from services.rm import get_publisher
+        return await run_in_threadpool(get_publisher().queue_depth, 1.0, bulk)
+    except Exception as e:
+        logger.warning(f"Queue depth unavailable: {e}")
+        return None
+
+
+def _admit(user_id: int, count: int, depth: Optional[int], bulk: bool = False) -> list:
+    # Очередь не успевает разбираться или у пользователя слишком много незавершённых задач;
+    # иначе места резервируются до track() / release()
+    try:
+        return get_admission_controller().check(user_id, count, depth, bulk=bulk)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
 
+
+def _queue_estimate(depth: Optional[int], count: int) -> dict:
+    if depth is None:
+        return {"queue_position": None, "estimated_wait_s": None}
+    position = depth + count
+    wait = get_admission_controller().estimated_wait(position)
+    return {
+        "queue_position": position,
+        "estimated_wait_s": None if wait is None or math.isinf(wait) else round(wait, 1)
+    }
+
+
+async def _submit_task(session, user_id: int, request: TaskRequest) -> tuple:
+    """Ставит задачу в очередь; возвращает её id и оценку позиции в очереди."""
+    depth = await _queue_depth()
+    reserved = _admit(user_id, 1, depth)
+    task_ids = []
+    try:
         # Создаём задачу
-        ml_task_service = MLTaskService(session)
-        task = ml_task_service.create_task(
-            user_id=actual_user_id,
+        ml_task_service = AsyncMLTaskService(session)
+        task = await ml_task_service.create_task(
+            user_id=user_id,
             model_name=request.model_name,
             input_data=request.input_data.strip()
         )
         task_id = task.id
+        # До публикации: событие завершения от воркера может прийти раньше, чем вернётся send_task
+        task_ids = [task_id]
+        get_admission_controller().track(user_id, task_ids, reserved=reserved)
 
         # Отправляем в RabbitMQ
         try:
             from services.rm import send_task
-            send_task({
+            # pika блокирующий — публикуем из threadpool, не занимая event loop
+            await run_in_threadpool(send_task, {
                 "task_id": task_id,
-                "user_id": actual_user_id,
+                "user_id": user_id,
                 "model_name": request.model_name,
                 "input_data": request.input_data.strip()
             })
@@ -56,14 +101,161 @@ async def new_request(
         except Exception as e:
             logger.error(f"Failed to send task to RabbitMQ: {e}")
             raise HTTPException(status_code=500, detail="Failed to send task to worker")
+    except BaseException:
+        get_admission_controller().release(user_id, [*reserved, *task_ids])
+        raise
+
+    return task_id, _queue_estimate(depth, 1)
+
+
+@ml_route.post("/send_task", status_code=201)
+async def new_request(
+    request: TaskRequest,
+    current_user: User = Depends(get_current_user),  # получаем из токена
+    session=Depends(get_async_session)
+):
+    try:
+        _validate_request(request)
+        task_id, estimate = await _submit_task(session, current_user.id, request)
 
         return {
             "message": f"Task {task_id} sent to ML workers",
-            "task_id": task_id
+            "task_id": task_id,
+            **estimate
         }
 
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error processing request: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+# Пакетная постановка задач: одна транзакция на вставку и одна публикация пачкой.
+# Невалидные элементы возвращаются в errors с их индексом, остальные принимаются
+@ml_route.post("/send_tasks", status_code=201)
+async def new_requests(
+    request: BulkTaskRequest,
+    current_user: User = Depends(get_current_user),
+    session=Depends(get_async_session)
+):
+    try:
+        accepted, errors = [], []
+        for index, item in enumerate(request.tasks):
+            error = _validation_error(item.input_data, item.model_name)
+            if error:
+                errors.append({"index": index, "detail": error})
+            else:
+                accepted.append((index, item.model_name, item.input_data.strip()))
+        if not accepted:
+            raise HTTPException(status_code=400, detail={"message": "No valid tasks", "errors": errors})
+
+        depth = await _queue_depth(bulk=True)
+        reserved = _admit(current_user.id, len(accepted), depth, bulk=True)
+        task_ids = []
+        try:
+            task_ids = await AsyncMLTaskService(session).create_tasks(
+                current_user.id, [(model_name, input_data) for _, model_name, input_data in accepted]
+            )
+            get_admission_controller().track(current_user.id, task_ids, bulk=True, reserved=reserved)
+
+            try:
+                from services.rm import send_tasks
+                await run_in_threadpool(send_tasks, [
+                    {
+                        "task_id": task_id,
+                        "user_id": current_user.id,
+                        "model_name": model_name,
+                        "input_data": input_data
+                    }
+                    for task_id, (_, model_name, input_data) in zip(task_ids, accepted)
+                ])
+                logger.info(f"{len(task_ids)} tasks sent to RabbitMQ")
+            except Exception as e:
+                logger.error(f"Failed to send tasks to RabbitMQ: {e}")
+                raise HTTPException(status_code=500, detail="Failed to send tasks to worker")
+        except BaseException:
+            get_admission_controller().release(current_user.id, [*reserved, *task_ids], bulk=True)
+            raise
+
+        return {
+            "message": f"{len(task_ids)} tasks sent to ML workers",
+            "tasks": [{"index": index, "task_id": task_id} for task_id, (index, _, _) in zip(task_ids, accepted)],
+            "errors": errors,
+            **_queue_estimate(depth, len(task_ids))
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing bulk request: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+async def _queue_is_short() -> bool:
+    depth = await _queue_depth()
+    return depth is not None and depth <= INLINE_MAX_QUEUE_DEPTH
+
+
+async def _record_inline_result(
+    user_id: int, model_name: str, input_data: str, recommendations: list, catalog_version: str
+) -> None:
+    try:
+        async with AsyncSessionLocal() as session:
+            await AsyncMLTaskService(session).record_completed(
+                user_id=user_id,
+                model_name=model_name,
+                input_data=input_data,
+                recommendations=recommendations,
+                catalog_version=catalog_version
+            )
+    except Exception as e:
+        logger.error(f"Failed to record inline recommendation: {e}")
+
+
+# Синхронная рекомендация: считаем в процессе API, пока очередь короткая,
+# под нагрузкой — обычная постановка задачи воркерам
+@ml_route.post("/recommend")
+async def recommend(
+    request: TaskRequest,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    session=Depends(get_async_session)
+):
+    try:
+        _validate_request(request)
+        input_data = request.input_data.strip()
+
+        recommender = get_recommender()
+        if recommender is not None and await _queue_is_short():
+            # Фиксируем версию каталога: фоновая перезагрузка не повлияет на этот запрос
+            state = recommender.state
+            recommendations = (await run_in_threadpool(
+                recommender.recommend, [input_data], request.model_name, state
+            ))[0]
+            # Задачу и предсказание записываем уже после ответа клиенту
+            background_tasks.add_task(
+                _record_inline_result,
+                current_user.id, request.model_name, input_data, recommendations, state.version
+            )
+            return {
+                "mode": "inline",
+                "model_name": request.model_name,
+                **render_result(recommendations, state.version, catalog=state.catalog)
+            }
+
+        task_id, estimate = await _submit_task(session, current_user.id, request)
+        response.status_code = 202
+        return {
+            "mode": "queued",
+            "message": f"Task {task_id} sent to ML workers",
+            "task_id": task_id,
+            **estimate
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing recommend request: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
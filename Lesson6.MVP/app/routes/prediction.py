@@ -1,18 +1,36 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from database.database import get_session
-from services.ml_task_service import MLTaskService
-from services.prediction_service import PredictionService
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from database.database import get_async_session, AsyncSessionLocal
+from models.ml_task import TaskStatus
+from services.ml_task_service import AsyncMLTaskService
+from services.task_events import get_task_event_hub
 import logging
 
 logger = logging.getLogger(__name__)
 
 prediction_route = APIRouter()
 
+# Как часто перепроверять статус в БД, если событие не пришло
+# (подстраховка на случай потери LISTEN-соединения) и слать keep-alive
+EVENTS_RECHECK_INTERVAL = 15.0
+EVENTS_FALLBACK_INTERVAL = 2.0
+EVENTS_MAX_DURATION = 600.0
+TERMINAL_STATUSES = {TaskStatus.DONE.name, TaskStatus.FAILED.name}
+
+
 @prediction_route.get("/all/{user_id}")
-async def view_predictions(user_id: int, session=Depends(get_session)):
-    ml_task_service = MLTaskService(session)
+async def view_predictions(
+    user_id: int,
+    before_id: Optional[int] = Query(None, description="Вернуть задачи старше задачи с этим id"),
+    limit: int = Query(50, ge=1, le=200),
+    session=Depends(get_async_session)
+):
+    ml_task_service = AsyncMLTaskService(session)
     try:
-        history = ml_task_service.get_task_history(user_id)
+        history = await ml_task_service.get_task_history(user_id, before_id=before_id, limit=limit)
         return history
     except Exception as e:
         logger.error(f"Error fetching prediction history: {str(e)}")
@@ -21,12 +39,63 @@ async def view_predictions(user_id: int, session=Depends(get_session)):
             detail="Failed to retrieve prediction history"
         )
 
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _load_task_state(task_id: int) -> Optional[dict]:
+    # Короткая сессия на каждую проверку: стрим не держит соединение из пула
+    async with AsyncSessionLocal() as session:
+        return await AsyncMLTaskService(session).get_task_state(task_id)
+
+
+# Стрим изменений статуса задачи (Server-Sent Events)
+@prediction_route.get("/{task_id}/events")
+async def stream_task_events(task_id: int, request: Request):
+    hub = get_task_event_hub()
+
+    async def event_stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + EVENTS_MAX_DURATION
+        last_status = None
+
+        # Подписываемся до чтения статуса, чтобы не пропустить событие между ними
+        async with hub.subscribe(task_id) as events:
+            while loop.time() < deadline:
+                state = await _load_task_state(task_id)
+                if state is None:
+                    yield _sse("error", {"task_id": task_id, "detail": "Task not found"})
+                    return
+
+                if state["status"] != last_status:
+                    last_status = state["status"]
+                    yield _sse("status", state)
+                    if last_status in TERMINAL_STATUSES:
+                        return
+
+                timeout = EVENTS_RECHECK_INTERVAL if hub.connected else EVENTS_FALLBACK_INTERVAL
+                try:
+                    await asyncio.wait_for(events.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+
+                if await request.is_disconnected():
+                    return
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # просмотр ответа на текущий запрос
 @prediction_route.get("/{task_id}")
-async def get_prediction_result(task_id: int, session=Depends(get_session)):
+async def get_prediction_result(task_id: int, session=Depends(get_async_session)):
     try:
-        ml_task_service = MLTaskService(session)
-        result = ml_task_service.run_task(task_id=task_id)
+        ml_task_service = AsyncMLTaskService(session)
+        result = await ml_task_service.run_task(task_id=task_id)
         if not result:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from database.database import get_session
+from database.database import get_session, get_async_session
 from models.user_log_aut import UserCreateLogin
-from services.user_service import UserService
+from services.user_service import UserService, AsyncUserService
 from fastapi.security import OAuth2PasswordRequestForm
-from auth.authenticate import authenticate
+from auth.authenticate import get_current_user as resolve_current_user
 from models.user import User
 from typing import Dict, List
 import logging
@@ -22,10 +22,10 @@ user_route = APIRouter()
     summary="User Registration",
     description='Registration a new user with email and password'
 )
-async def signup(data: UserCreateLogin, session=Depends(get_session)) -> Dict[str, str]:
+async def signup(data: UserCreateLogin, session=Depends(get_async_session)) -> Dict[str, str]:
     try:
-        user_service = UserService(session)
-        user_service.create_user(data.email, data.password)
+        user_service = AsyncUserService(session)
+        await user_service.create_user(data.email, data.password)
         logger.info(f"New user registered: {data.email}")
         return {"message": "User successfully registered"}
 
@@ -52,19 +52,17 @@ async def signup(data: UserCreateLogin, session=Depends(get_session)) -> Dict[st
         )
     
 @user_route.post('/signin')
-async def signin(data: OAuth2PasswordRequestForm = Depends(), session=Depends(get_session)) -> Dict[str, str]:
+async def signin(data: OAuth2PasswordRequestForm = Depends(), session=Depends(get_async_session)) -> Dict[str, str]:
 
-    user_service = UserService(session)
-    user = user_service.get_by_email(data.username)
+    user_service = AsyncUserService(session)
+    try:
+        user = await user_service.authenticate(data.username, data.password)
+    except ValueError:
+        raise HTTPException(status_code=403, detail="Wrong password")
     if not user:
         raise HTTPException(status_code=404, detail="User doesn't exist")
-    
-    user_service.password = user.password
-    
-    if not user_service.check_password(data.password):
-        raise HTTPException(status_code=403, detail="Wrong password")
 
-    access_token = create_access_token(user.email)
+    access_token = create_access_token(user.email, user.id)
     
     return {"message": "User signed in successfully",
         "access_token": access_token     
@@ -93,9 +91,5 @@ def get_all_users(session=Depends(get_session)):
 
     
 @user_route.get("/me")
-async def get_current_user(email: str = Depends(authenticate), session=Depends(get_session)):
-    user_service = UserService(session)
-    user = user_service.get_by_email(email)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+async def get_current_user(user: User = Depends(resolve_current_user)):
     return {"id": user.id, "email": user.email}
@@ -0,0 +1,191 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ML_ADMISSION_ENABLED", "true").lower() == "true"
+# SLO на ожидание в очереди (сек): дольше — задача не принимается
+ADMISSION_MAX_WAIT = float(os.getenv("ML_ADMISSION_MAX_WAIT", "60"))
+ADMISSION_BULK_MAX_WAIT = float(os.getenv("ML_ADMISSION_BULK_MAX_WAIT", "1800"))
+# Ниже этой глубины очереди задачи принимаются без оценки скорости
+ADMISSION_MIN_DEPTH = int(os.getenv("ML_ADMISSION_MIN_DEPTH", "100"))
+# Жёсткий предел глубины, если скорость обработки неизвестна (нет событий задач)
+ADMISSION_MAX_DEPTH = int(os.getenv("ML_ADMISSION_MAX_DEPTH", "5000"))
+# Незавершённых задач на пользователя: одиночных и из пакетной постановки
+USER_MAX_IN_FLIGHT = int(os.getenv("ML_USER_MAX_IN_FLIGHT", "20"))
+USER_MAX_BULK_IN_FLIGHT = int(os.getenv("ML_USER_MAX_BULK_IN_FLIGHT", "10000"))
+# Задача перестаёт считаться незавершённой через это время, даже если событие потерялось
+IN_FLIGHT_TTL = float(os.getenv("ML_IN_FLIGHT_TTL", "600"))
+# Окно оценки скорости обработки задач воркерами (сек)
+RATE_WINDOW = 30.0
+MAX_RETRY_AFTER = 300
+
+TERMINAL_STATUSES = {"DONE", "FAILED"}
+
+
+class AdmissionRejected(Exception):
+    """Задача не принята: роут отвечает 429 с заголовком Retry-After."""
+
+    def __init__(self, detail, retry_after: int):
+        super().__init__(str(detail))
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Контроль допуска задач в очередь.
+
+    Скорость обработки оценивается по событиям завершения задач из
+    TaskEventHub (NOTIFY воркеров) за последние RATE_WINDOW секунд:
+    ожидание = глубина очереди / скорость. Незавершённые задачи
+    пользователя считаются в памяти процесса — без COUNT в БД на запрос —
+    и снимаются по событию завершения или по истечении IN_FLIGHT_TTL.
+    check() резервирует места атомарно, пока задачи ещё вставляются и
+    публикуются: параллельные запросы пользователя не обходят лимит.
+    track() вызывается до публикации, иначе событие завершения задачи
+    может прийти раньше и id останется висеть до IN_FLIGHT_TTL.
+    """
+
+    def __init__(self, hub=None):
+        self._hub = hub
+        self._started_at = time.monotonic()
+        self._completions = deque()
+        # user_id -> {task_id: истекает}; порядок вставки совпадает с порядком истечения
+        self._in_flight = {False: defaultdict(OrderedDict), True: defaultdict(OrderedDict)}
+        self._lock = threading.Lock()
+
+    def on_task_event(self, event: dict) -> None:
+        if event.get("status") not in TERMINAL_STATUSES:
+            return
+        with self._lock:
+            self._completions.append(time.monotonic())
+            for in_flight in self._in_flight.values():
+                tasks = in_flight.get(event.get("user_id"))
+                if tasks is not None:
+                    tasks.pop(event.get("task_id"), None)
+
+    def drain_rate(self) -> Optional[float]:
+        """Задач в секунду за окно; None, пока событий нет (слушатель не подключён или окно не набрано)."""
+        now = time.monotonic()
+        with self._lock:
+            while self._completions and self._completions[0] < now - RATE_WINDOW:
+                self._completions.popleft()
+            completions = len(self._completions)
+        connected = self._hub is None or self._hub.connected
+        if not connected or (not completions and now - self._started_at < RATE_WINDOW):
+            return None
+        return completions / RATE_WINDOW
+
+    def estimated_wait(self, position: int) -> Optional[float]:
+        rate = self.drain_rate()
+        if rate is None:
+            return None
+        return math.inf if rate == 0 else position / rate
+
+    def _in_flight_locked(self, user_id: int, bulk: bool) -> int:
+        tasks = self._in_flight[bulk].get(user_id)
+        if tasks is None:
+            return 0
+        now = time.monotonic()
+        while tasks and next(iter(tasks.values())) < now:
+            tasks.popitem(last=False)
+        if not tasks:
+            del self._in_flight[bulk][user_id]
+        return len(tasks)
+
+    def in_flight(self, user_id: int, bulk: bool = False) -> int:
+        with self._lock:
+            return self._in_flight_locked(user_id, bulk)
+
+    def track(self, user_id: int, task_ids: list, bulk: bool = False, reserved: list = ()) -> None:
+        """Заменяет места, зарезервированные check(), на id поставленных задач."""
+        expires_at = time.monotonic() + IN_FLIGHT_TTL
+        with self._lock:
+            tasks = self._in_flight[bulk][user_id]
+            for key in reserved:
+                tasks.pop(key, None)
+            for task_id in task_ids:
+                tasks[task_id] = expires_at
+
+    def release(self, user_id: int, reserved: list, bulk: bool = False) -> None:
+        """Освобождает места (ключи резерва или id задач), если задачи так и не были поставлены в очередь."""
+        self.track(user_id, [], bulk=bulk, reserved=reserved)
+
+    def check(self, user_id: int, count: int, depth: Optional[int], bulk: bool = False) -> list:
+        """
+        Бросает AdmissionRejected, если задачи пользователя не влезают в лимиты или SLO очереди.
+        Иначе резервирует count мест и возвращает их ключи для track() или release().
+        """
+        if not ADMISSION_ENABLED:
+            return []
+
+        self._check_queue(count, depth, bulk)
+
+        limit = USER_MAX_BULK_IN_FLIGHT if bulk else USER_MAX_IN_FLIGHT
+        with self._lock:
+            in_flight = self._in_flight_locked(user_id, bulk)
+            if in_flight + count <= limit:
+                expires_at = time.monotonic() + IN_FLIGHT_TTL
+                reserved = [object() for _ in range(count)]
+                tasks = self._in_flight[bulk][user_id]
+                for key in reserved:
+                    tasks[key] = expires_at
+                return reserved
+        raise AdmissionRejected(
+            f"Too many unfinished tasks: {in_flight} in flight, limit {limit}",
+            self._retry_after(in_flight + count - limit),
+        )
+
+    def _check_queue(self, count: int, depth: Optional[int], bulk: bool) -> None:
+        if depth is None or depth + count <= ADMISSION_MIN_DEPTH:
+            return
+        position = depth + count
+        max_wait = ADMISSION_BULK_MAX_WAIT if bulk else ADMISSION_MAX_WAIT
+        wait = self.estimated_wait(position)
+        if wait is None:
+            if position <= ADMISSION_MAX_DEPTH:
+                return
+            excess = position - ADMISSION_MAX_DEPTH
+        elif wait <= max_wait:
+            return
+        else:
+            excess = position - int(self.drain_rate() * max_wait)
+        logger.warning(f"Admission rejected: queue depth {depth}, estimated wait {wait}")
+        raise AdmissionRejected(
+            {
+                "message": "ML workers are overloaded, try again later",
+                "queue_position": position,
+                "estimated_wait_s": None if wait is None or math.isinf(wait) else round(wait, 1),
+            },
+            self._retry_after(excess),
+        )
+
+    def _retry_after(self, excess: int) -> int:
+        """Через сколько секунд воркеры разберут excess задач (1..MAX_RETRY_AFTER)."""
+        rate = self.drain_rate()
+        if not rate:
+            return int(RATE_WINDOW)
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(excess / rate)))
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                from services.task_events import get_task_event_hub
+
+                hub = get_task_event_hub()
+                _controller = AdmissionController(hub)
+                hub.add_listener(_controller.on_task_event)
+    return _controller
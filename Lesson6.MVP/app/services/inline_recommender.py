@@ -0,0 +1,54 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INLINE_ENABLED = os.getenv("ML_INLINE_ENABLED", "true").lower() == "true"
+# Считаем инлайн, только пока очередь воркеров почти пуста
+INLINE_MAX_QUEUE_DEPTH = int(os.getenv("ML_INLINE_MAX_QUEUE_DEPTH", "5"))
+
+_recommender = None
+_loading_started = False
+_lock = threading.Lock()
+
+
+def _load() -> None:
+    global _recommender
+    try:
+        from ml_worker.recommender import CATALOG_RELOAD_INTERVAL, Recommender
+        from ml_worker.result_cache import ResultCache
+
+        _recommender = Recommender(cache=ResultCache(
+            maxsize=int(os.getenv("ML_RESULT_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("ML_RESULT_CACHE_TTL", "3600")),
+        ))
+        logger.info("Inline recommender ready")
+    except Exception as e:
+        logger.warning(f"Inline recommender unavailable, /recommend will use the queue: {e}")
+        return
+
+    # Новые версии каталога подхватываем в этом же фоновом потоке, не в запросах
+    while True:
+        time.sleep(CATALOG_RELOAD_INTERVAL)
+        try:
+            _recommender.maybe_reload()
+        except Exception as e:
+            logger.error(f"Catalog reload check failed: {e}")
+
+
+def start_loading() -> None:
+    """Загружает модель и каталог в фоне: старт API не ждёт загрузки SBERT."""
+    global _loading_started
+    if not INLINE_ENABLED:
+        return
+    with _lock:
+        if _loading_started:
+            return
+        _loading_started = True
+    threading.Thread(target=_load, name="inline-recommender-loader", daemon=True).start()
+
+
+def get_recommender():
+    return _recommender
@@ -0,0 +1,87 @@
+import logging
+import time
+
+from prometheus_client import REGISTRY, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import func
+from sqlmodel import select
+
+from database.database import async_engine, engine
+from models.ml_task import MLTask, TaskStatus
+
+logger = logging.getLogger(__name__)
+
+# Подсчёт задач по статусам идёт в БД, поэтому не чаще раза в столько секунд
+STATUS_COUNTS_INTERVAL = 15.0
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "API request latency until the response starts",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+TASKS_BY_STATUS = Gauge("ml_tasks", "ML tasks by status", ["status"])
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: время ответа по шаблону маршрута (/api/predictions/{task_id},
+    а не по конкретному URL). Для потоков SSE — время до начала ответа.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                REQUEST_SECONDS.labels(
+                    scope["method"], getattr(route, "path", "unmatched"), message["status"],
+                ).observe(time.perf_counter() - started)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class DBPoolCollector:
+    """Состояние пулов соединений database.database на момент опроса /metrics."""
+
+    def __init__(self, engines: dict):
+        self.engines = engines
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "db_pool_connections", "Connections in the API DB pools", labels=["pool", "state"],
+        )
+        for name, db_engine in self.engines.items():
+            pool = db_engine.pool  # после dispose() у движка новый пул
+            if not hasattr(pool, "checkedout"):
+                continue
+            family.add_metric([name, "size"], pool.size())
+            family.add_metric([name, "checked_out"], pool.checkedout())
+            family.add_metric([name, "checked_in"], pool.checkedin())
+            family.add_metric([name, "overflow"], max(0, pool.overflow()))
+        yield family
+
+
+REGISTRY.register(DBPoolCollector({"sync": engine, "async": async_engine}))
+
+_status_counts_at = 0.0
+
+
+async def update_task_status_counts(session) -> None:
+    global _status_counts_at
+    if time.monotonic() - _status_counts_at < STATUS_COUNTS_INTERVAL:
+        return
+    rows = await session.exec(select(MLTask.status, func.count()).group_by(MLTask.status))
+    counts = {status: count for status, count in rows.all()}
+    for status in TaskStatus:
+        TASKS_BY_STATUS.labels(status.name).set(counts.get(status, 0))
+    _status_counts_at = time.monotonic()
@@ -1,8 +1,54 @@
-from sqlmodel import Session
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import insert, tuple_
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models.ml_task import MLTask, TaskStatus
 from models.prediction import MLPrediction
 from services.user_service import UserService
 from services.prediction_service import PredictionService
+from services.result_renderer import render_result
+
+
+def _task_result(task: MLTask, prediction: Optional[MLPrediction]) -> dict:
+    if task.status == TaskStatus.PENDING:
+        return {"status": "PENDING", "message": "Task is still pending"}
+
+    if task.status == TaskStatus.FAILED:
+        return {"status": "FAILED", "message": "Task failed"}
+
+    if task.status == TaskStatus.DONE and task.result_id:
+        if prediction:
+            return {
+                "model_name": prediction.model_name,
+                **render_result(
+                    prediction.recommendations, prediction.catalog_version, prediction.prediction_result
+                )
+            }
+        else:
+            return {"status": "DONE", "message": "Result not found"}
+    else:
+        return {"status": task.status.value}
+
+
+def _history_item(row) -> dict:
+    # Определяем текст ответа
+    if row.status == TaskStatus.DONE and row.result_id:
+        result = render_result(row.recommendations, row.catalog_version, row.prediction_result)
+    elif row.status == TaskStatus.FAILED:
+        result = {"prediction_result": "Задача завершилась с ошибкой", "recommendations": None}
+    else:
+        result = {"prediction_result": "Ответ в обработке...", "recommendations": None}
+
+    return {
+        "id": row.id,
+        "input_data": row.input_data,
+        **result,
+        "model_name": row.model_name,
+        "status": row.status.value,
+        "timestamp": row.created_at.isoformat()
+    }
+
 
 class MLTaskService:
     def __init__(self, session: Session):
@@ -26,53 +72,158 @@ class MLTaskService:
         if not task:
             raise ValueError("Task not found")
 
-        if task.status == TaskStatus.PENDING:
-            return {"status": "PENDING", "message": "Task is still pending"}
-
-        if task.status == TaskStatus.FAILED:
-            return {"status": "FAILED", "message": "Task failed"}
-
+        prediction = None
         if task.status == TaskStatus.DONE and task.result_id:
             prediction = self.session.get(MLPrediction, task.result_id)
-            if prediction:
-                return {
-                    "model_name": prediction.model_name,
-                    "prediction_result": prediction.prediction_result
-                }
-            else:
-                return {"status": "DONE", "message": "Result not found"}
-        else:
-            return {"status": task.status.value}
+        return _task_result(task, prediction)
+
+    @staticmethod
+    def history_query(user_id: int, before_id: Optional[int] = None, limit: int = 50):
+        query = (
+            select(
+                MLTask.id,
+                MLTask.input_data,
+                MLTask.model_name,
+                MLTask.status,
+                MLTask.result_id,
+                MLTask.created_at,
+                MLPrediction.prediction_result,
+                MLPrediction.recommendations,
+                MLPrediction.catalog_version,
+            )
+            .outerjoin(MLPrediction, MLPrediction.id == MLTask.result_id)
+            .where(MLTask.user_id == user_id)
+        )
+
+        if before_id is not None:
+            cursor_created_at = (
+                select(MLTask.created_at)
+                .where(MLTask.id == before_id)
+                .scalar_subquery()
+            )
+            query = query.where(
+                tuple_(MLTask.created_at, MLTask.id) < tuple_(cursor_created_at, before_id)
+            )
+
+        return query.order_by(MLTask.created_at.desc(), MLTask.id.desc()).limit(limit)
+
+    def get_task_history(self, user_id: int, before_id: Optional[int] = None, limit: int = 50):
+        """
+        История задач пользователя одним запросом (MLTask LEFT JOIN MLPrediction).
+        Keyset-пагинация: limit последних задач старше задачи before_id,
+        в хронологическом порядке.
+        """
+        rows = self.session.execute(self.history_query(user_id, before_id, limit)).all()
+        return [_history_item(row) for row in reversed(rows)]
 
 
+class AsyncMLTaskService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create_task(self, user_id: int, model_name: str, input_data: str) -> MLTask:
+        task = MLTask(
+            user_id=user_id,
+            model_name=model_name,
+            input_data=input_data
+        )
+        self.session.add(task)
+        await self.session.commit()
+        await self.session.refresh(task)
+        return task
+
+    async def create_tasks(self, user_id: int, tasks: list) -> list:
+        """
+        Создаёт задачи (model_name, input_data) одним INSERT ... RETURNING id
+        в одной транзакции; id возвращаются в порядке tasks.
+        """
+        now = datetime.now()
+        result = await self.session.execute(
+            insert(MLTask).returning(MLTask.id, sort_by_parameter_order=True),
+            [
+                {
+                    "user_id": user_id,
+                    "model_name": model_name,
+                    "input_data": input_data,
+                    "status": TaskStatus.PENDING,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for model_name, input_data in tasks
+            ],
+        )
+        task_ids = list(result.scalars())
+        await self.session.commit()
+        return task_ids
 
-    def get_task_history(self, user_id: int):
+    async def record_completed(
+        self,
+        user_id: int,
+        model_name: str,
+        input_data: str,
+        recommendations: list,
+        catalog_version: Optional[str] = None,
+    ) -> MLTask:
+        """Записывает уже посчитанную рекомендацию: задача и предсказание одной транзакцией."""
+        prediction = MLPrediction(
+            user_id=user_id,
+            model_name=model_name,
+            recommendations=recommendations,
+            catalog_version=catalog_version
+        )
+        self.session.add(prediction)
+        await self.session.flush()
 
-        tasks = (
-            self.session.query(MLTask)
-            .filter(MLTask.user_id == user_id)
-            .order_by(MLTask.created_at.asc()) 
-            .all()
+        now = datetime.now()
+        task = MLTask(
+            user_id=user_id,
+            model_name=model_name,
+            input_data=input_data,
+            status=TaskStatus.DONE,
+            created_at=now,
+            updated_at=now,
+            completed_at=now,
+            result_id=prediction.id
         )
-        
-        result = []
-        for task in tasks:
-            # Определяем текст ответа
-            if task.status == TaskStatus.DONE and task.result_id:
-                prediction = self.session.get(MLPrediction, task.result_id)
-                prediction_result = prediction.prediction_result if prediction else "Ответ недоступен"
-            elif task.status == TaskStatus.FAILED:
-                prediction_result = "Задача завершилась с ошибкой"
-            else:
-                prediction_result = "Ответ в обработке..."
-
-            result.append({
-                "id": task.id,
-                "input_data": task.input_data,
-                "prediction_result": prediction_result,
-                "model_name": task.model_name,
-                "status": task.status.value,
-                "timestamp": task.created_at.isoformat()
-            })
-        
-        return result
\ No newline at end of file
+        self.session.add(task)
+        await self.session.commit()
+        return task
+
+    async def run_task(self, task_id: int) -> dict:
+        task = await self.session.get(MLTask, task_id)
+        if not task:
+            raise ValueError("Task not found")
+
+        prediction = None
+        if task.status == TaskStatus.DONE and task.result_id:
+            prediction = await self.session.get(MLPrediction, task.result_id)
+        return _task_result(task, prediction)
+
+    async def get_task_state(self, task_id: int) -> Optional[dict]:
+        """Статус задачи и, если она выполнена, результат — одним запросом."""
+        row = (await self.session.execute(
+            select(
+                MLTask.id,
+                MLTask.status,
+                MLPrediction.model_name,
+                MLPrediction.prediction_result,
+                MLPrediction.recommendations,
+                MLPrediction.catalog_version,
+            )
+            .outerjoin(MLPrediction, MLPrediction.id == MLTask.result_id)
+            .where(MLTask.id == task_id)
+        )).first()
+        if row is None:
+            return None
+
+        state = {"task_id": row.id, "status": row.status.name}
+        if row.status == TaskStatus.DONE:
+            state["model_name"] = row.model_name
+            state.update(render_result(row.recommendations, row.catalog_version, row.prediction_result))
+        return state
+
+    async def get_task_history(self, user_id: int, before_id: Optional[int] = None, limit: int = 50):
+        rows = (await self.session.execute(
+            MLTaskService.history_query(user_id, before_id, limit)
+        )).all()
+        return [_history_item(row) for row in reversed(rows)]
@@ -1,4 +1,5 @@
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models.prediction import MLPrediction
 
 class PredictionService:
@@ -18,3 +19,20 @@ class PredictionService:
             .order_by(MLPrediction.timestamp.desc())
         ).all()
 
+
+class AsyncPredictionService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add_prediction(self, prediction: MLPrediction) -> MLPrediction:
+        self.session.add(prediction)
+        await self.session.commit()
+        await self.session.refresh(prediction)
+        return prediction
+
+    async def get_history(self, user_id: int) -> list[MLPrediction]:
+        return (await self.session.exec(
+            select(MLPrediction)
+            .where(MLPrediction.user_id == user_id)
+            .order_by(MLPrediction.timestamp.desc())
+        )).all()
@@ -0,0 +1,75 @@
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Каталоги по директориям версий: memory-map, открываются один раз на процесс
+_catalogs = {}
+_lock = threading.Lock()
+
+
+def _catalog_for(catalog_version: Optional[str]):
+    """
+    Открывает готовый артефакт только на чтение: вызывается из async-обработчиков,
+    поэтому сборка каталога (pandas, эмбеддинги) здесь не выполняется — см. warm_up.
+    Точность та же, что у воркеров: от неё зависит хеш каталога в catalog_version.
+    """
+    from ml_worker.catalog import Catalog, catalog_dir_for_version, catalog_filename
+    from ml_worker.recommender import DEFAULT_DATA_DIR, EMBEDDING_PRECISION
+
+    catalog_dir = catalog_dir_for_version(DEFAULT_DATA_DIR, catalog_version)
+    with _lock:
+        catalog = _catalogs.get(catalog_dir)
+        if catalog is None:
+            catalog = _catalogs[catalog_dir] = Catalog(catalog_dir / catalog_filename(EMBEDDING_PRECISION))
+    return catalog
+
+
+def warm_up() -> None:
+    """Собирает (при необходимости) и открывает активный каталог; блокирующий вызов для старта API."""
+    from ml_worker.catalog import Catalog, resolve_catalog_dir
+    from ml_worker.recommender import DEFAULT_DATA_DIR, EMBEDDING_PRECISION
+
+    catalog_dir = resolve_catalog_dir(DEFAULT_DATA_DIR)
+    try:
+        catalog = Catalog.load(catalog_dir, precision=EMBEDDING_PRECISION)
+    except Exception as e:
+        logger.error(f"Catalog warm-up failed ({catalog_dir}): {e}")
+        return
+    with _lock:
+        _catalogs[catalog_dir] = catalog
+
+
+def render_result(
+    recommendations: Optional[list],
+    catalog_version: Optional[str],
+    prediction_result: Optional[str] = None,
+    catalog=None,
+) -> dict:
+    """
+    Текст ответа и структурированные рекомендации по [[talk_id, score], ...].
+    Сохранённый текст отдаётся, если recommendations нет (запись не переведена
+    миграцией) или каталог не тот, которым считался результат: talk_id другого
+    каталога указали бы на другие доклады.
+    """
+    fallback = {
+        "prediction_result": prediction_result if prediction_result else "Ответ недоступен",
+        "recommendations": None,
+    }
+    if recommendations is None:
+        return fallback
+    try:
+        from ml_worker.catalog import catalog_hash_for_version
+
+        catalog = catalog or _catalog_for(catalog_version)
+        if catalog.version != catalog_hash_for_version(catalog_version):
+            logger.warning(f"Catalog {catalog.version} does not match result version {catalog_version}")
+            return fallback
+        return {
+            "prediction_result": catalog.render(recommendations),
+            "recommendations": catalog.describe(recommendations),
+        }
+    except Exception as e:
+        logger.error(f"Failed to render recommendations (catalog {catalog_version}): {e}")
+        return fallback
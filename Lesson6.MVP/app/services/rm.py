@@ -1,39 +1,191 @@
 import pika
 import json
+import logging
 import os
+import threading
+import time
+from typing import Iterable
 
+from pika.exceptions import AMQPConnectionError, AMQPChannelError, StreamLostError
+
+logger = logging.getLogger(__name__)
 
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")
 RABBITMQ_PORT = int(os.getenv("RABBITMQ_PORT"))
 RABBITMQ_USER = os.getenv("RABBITMQ_USER")
 RABBITMQ_PASS = os.getenv("RABBITMQ_PASS")
 RABBITMQ_VIRTUAL_HOST = os.getenv("RABBITMQ_VIRTUAL_PORT", "/")
+RABBITMQ_PUBLISH_CONFIRMS = os.getenv("RABBITMQ_PUBLISH_CONFIRMS", "true").lower() == "true"
+
+QUEUE_NAME = 'ml_task'
+# Пакетная постановка (/api/ml/send_tasks): воркеры берут её после интерактивных задач
+BULK_QUEUE_NAME = 'ml_task.bulk'
 
 # Параметры подключения
 connection_params = pika.ConnectionParameters(
-    host=RABBITMQ_HOST,  
-    port=RABBITMQ_PORT,          
-    virtual_host=RABBITMQ_VIRTUAL_HOST,  
+    host=RABBITMQ_HOST,
+    port=RABBITMQ_PORT,
+    virtual_host=RABBITMQ_VIRTUAL_HOST,
     credentials=pika.PlainCredentials(
-        username=RABBITMQ_USER,  
-        password=RABBITMQ_PASS  
+        username=RABBITMQ_USER,
+        password=RABBITMQ_PASS
     ),
     heartbeat=30,
     blocked_connection_timeout=60
 )
 
-def send_task(task_data: dict):
-    connection = pika.BlockingConnection(connection_params)
-    channel = connection.channel()
 
-    queue_name = 'ml_task'
-    channel.queue_declare(queue=queue_name, durable=True)
+class RabbitPublisher:
+    """
+    Долгоживущее подключение к RabbitMQ, общее для процесса API.
+
+    Очередь объявляется один раз на соединение; при обрыве соединение
+    переоткрывается автоматически. BlockingConnection не потокобезопасен,
+    поэтому все операции выполняются под блокировкой.
+    """
+
+    def __init__(
+        self,
+        params: pika.ConnectionParameters,
+        queue: str = QUEUE_NAME,
+        confirms: bool = True,
+        bulk_queue: str = BULK_QUEUE_NAME,
+    ):
+        self.params = params
+        self.queue = queue
+        self.bulk_queue = bulk_queue
+        self.confirms = confirms
+        self._connection = None
+        self._channel = None
+        self._batch_channel = None
+        self._lock = threading.Lock()
+        # Глубина по очередям: (значение, когда проверено)
+        self._depths = {}
+
+    def _ensure_channel(self):
+        if self._channel is not None and self._channel.is_open and self._connection.is_open:
+            # Обрабатываем накопившиеся heartbeat-кадры, иначе брокер закроет простаивающее соединение
+            self._connection.process_data_events(time_limit=0)
+            return self._channel
+
+        self._close()
+        self._connection = pika.BlockingConnection(self.params)
+        self._channel = self._connection.channel()
+        self._channel.queue_declare(queue=self.queue, durable=True)
+        self._channel.queue_declare(queue=self.bulk_queue, durable=True)
+        if self.confirms:
+            self._channel.confirm_delivery()
+            # Пачки публикуются в транзакции AMQP на отдельном канале:
+            # транзакции и confirms на одном канале не совмещаются
+            self._batch_channel = self._connection.channel()
+            self._batch_channel.tx_select()
+        logger.info("RabbitMQ publisher connected")
+        return self._channel
+
+    def _close(self):
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except Exception as e:
+            logger.warning(f"Error while closing RabbitMQ connection: {e}")
+        finally:
+            self._connection = None
+            self._channel = None
+            self._batch_channel = None
+
+    def _publish(self, messages: list, queue: str):
+        channel = self._ensure_channel()
+        # Пачку брокер подтверждает целиком одним tx.commit вместо ack на каждое
+        # сообщение; при обрыве до commit не публикуется ничего, повтор безопасен
+        batch = self.confirms and len(messages) > 1
+        if batch:
+            channel = self._batch_channel
+        for body, properties in messages:
+            # С включёнными подтверждениями одиночный basic_publish ждёт ack брокера
+            channel.basic_publish(
+                exchange='',
+                routing_key=queue,
+                body=body,
+                properties=properties,
+            )
+        if batch:
+            channel.tx_commit()
+
+    def publish_many(self, tasks: Iterable[dict], bulk: bool = False) -> None:
+        # Пользователь в заголовке: по нему воркер чередует задачи разных пользователей
+        messages = [
+            (
+                json.dumps(task_data),
+                pika.BasicProperties(
+                    delivery_mode=pika.DeliveryMode.Persistent,
+                    headers={"x-user-id": task_data["user_id"]},
+                ),
+            )
+            for task_data in tasks
+        ]
+        if not messages:
+            return
+        queue = self.bulk_queue if bulk else self.queue
+
+        with self._lock:
+            try:
+                self._publish(messages, queue)
+            except (AMQPConnectionError, AMQPChannelError, StreamLostError) as e:
+                # Одна попытка переподключения: соединение могло быть закрыто брокером
+                logger.warning(f"RabbitMQ publish failed ({e!r}), reconnecting")
+                self._close()
+                self._publish(messages, queue)
+
+    def publish(self, task_data: dict) -> None:
+        self.publish_many([task_data])
+
+    def queue_depth(self, max_age: float = 1.0, bulk: bool = False) -> int:
+        """
+        Число сообщений, ожидающих в очереди (passive queue_declare).
+        Значение кэшируется на max_age секунд, чтобы не ходить к брокеру на каждый запрос.
+        """
+        queue = self.bulk_queue if bulk else self.queue
+        with self._lock:
+            now = time.monotonic()
+            depth, checked_at = self._depths.get(queue, (0, float("-inf")))
+            if now - checked_at < max_age:
+                return depth
+            try:
+                frame = self._ensure_channel().queue_declare(queue=queue, passive=True)
+            except (AMQPConnectionError, AMQPChannelError, StreamLostError) as e:
+                logger.warning(f"RabbitMQ queue depth check failed ({e!r}), reconnecting")
+                self._close()
+                frame = self._ensure_channel().queue_declare(queue=queue, passive=True)
+            depth = frame.method.message_count
+            self._depths[queue] = (depth, now)
+            return depth
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher() -> RabbitPublisher:
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = RabbitPublisher(connection_params, confirms=RABBITMQ_PUBLISH_CONFIRMS)
+    return _publisher
+
+
+def close_publisher() -> None:
+    if _publisher is not None:
+        _publisher.close()
+
+
+def send_task(task_data: dict):
+    get_publisher().publish(task_data)
 
-    message = json.dumps(task_data)
 
-    channel.basic_publish(
-        exchange='',
-        routing_key=queue_name,
-        body=message
-    )
-    connection.close()
\ No newline at end of file
+def send_tasks(tasks: Iterable[dict], bulk: bool = True):
+    get_publisher().publish_many(tasks, bulk=bulk)
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+from sqlalchemy import text
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "ml_task_events"
+
+
+def notify_task_events(session, events: list) -> None:
+    """
+    Публикует смену статуса задач ({task_id, user_id, status, result_id})
+    через Postgres NOTIFY, все события одним запросом. Уведомления уходят
+    подписчикам только после коммита транзакции, поэтому клиент не увидит
+    статус раньше, чем он попадёт в БД.
+    """
+    if not events:
+        return
+    session.execute(
+        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+        {"channel": CHANNEL, "payloads": [json.dumps(event) for event in events]},
+    )
+
+
+class TaskEventHub:
+    """
+    Одно LISTEN-соединение на процесс API, раздающее события задач
+    подписчикам (SSE-стримам) через asyncio.Queue.
+    """
+
+    def __init__(self, dsn: str, reconnect_delay: float = 5.0):
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self._connection = None
+        self._subscribers: dict[int, set[asyncio.Queue]] = defaultdict(set)
+        # Получают события всех задач (например, контроль допуска)
+        self._listeners: list[Callable[[dict], None]] = []
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._stopped = False
+
+    @property
+    def connected(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    async def start(self) -> None:
+        self._stopped = False
+        try:
+            await self._connect()
+        except Exception as e:
+            logger.error(f"Task event listener unavailable: {e}")
+            self._schedule_reconnect()
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        self._connection = await asyncpg.connect(self.dsn)
+        self._connection.add_termination_listener(self._on_terminate)
+        await self._connection.add_listener(CHANNEL, self._on_notify)
+        logger.info(f"Listening for task events on '{CHANNEL}'")
+
+    def _on_terminate(self, connection) -> None:
+        if not self._stopped:
+            logger.warning("Task event listener connection lost")
+            self._schedule_reconnect()
+
+    def _schedule_reconnect(self) -> None:
+        if self._stopped or (self._reconnect_task and not self._reconnect_task.done()):
+            return
+        self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        while not self._stopped:
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self._connect()
+                return
+            except Exception as e:
+                logger.warning(f"Task event listener reconnect failed: {e}")
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Malformed task event: {payload!r}")
+            return
+        self.dispatch(event)
+
+    def add_listener(self, listener: Callable[[dict], None]) -> None:
+        self._listeners.append(listener)
+
+    def dispatch(self, event: dict) -> None:
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Task event listener failed: {e}")
+        for queue in self._subscribers.get(event.get("task_id"), ()):
+            queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, task_id: int):
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers[task_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[task_id].discard(queue)
+            if not self._subscribers[task_id]:
+                del self._subscribers[task_id]
+
+    async def stop(self) -> None:
+        self._stopped = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        if self.connected:
+            await self._connection.close()
+        self._connection = None
+
+
+task_event_hub: Optional[TaskEventHub] = None
+
+
+def get_task_event_hub() -> TaskEventHub:
+    global task_event_hub
+    if task_event_hub is None:
+        from database.config import get_settings
+        task_event_hub = TaskEventHub(get_settings().DATABASE_URL)
+    return task_event_hub
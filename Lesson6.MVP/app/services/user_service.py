@@ -1,11 +1,22 @@
 from sqlmodel import Session, select
-import bcrypt
+from sqlmodel.ext.asyncio.session import AsyncSession
+import logging
 import re
 from models.user import User
+from auth.user_cache import user_cache
+from services.password_hasher import (
+    hash_password,
+    verify_password,
+    needs_rehash,
+    hash_password_async,
+    verify_password_async,
+)
 
-class UserService:
-    def __init__(self, session: Session):
-        self.session = session
+logger = logging.getLogger(__name__)
+
+
+class UserValidationMixin:
+    """Валидация и хеширование паролей, общие для sync и async сервисов."""
 
     def set_password(self, password_: str):
         self._validate_password(password_)
@@ -23,13 +34,15 @@ class UserService:
             raise ValueError("The password must contain at least 8 characters!")
     
     def _hash_password(self, password_: str) -> str:
-        return bcrypt.hashpw(password_.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        return hash_password(password_)
 
     def check_password(self, password_: str) -> bool:
-        return bcrypt.checkpw(
-            password_.encode('utf-8'),
-            self.password.encode('utf-8') 
-        )
+        return verify_password(password_, self.password)
+
+
+class UserService(UserValidationMixin):
+    def __init__(self, session: Session):
+        self.session = session
 
     def get_by_email(self, email: str) -> User | None:
         return self.session.exec(select(User).where(User.email == email)).first()
@@ -57,4 +70,58 @@ class UserService:
         return user
 
     def get_all_users(self) -> list[User]:
-        return self.session.exec(select(User)).all()
\ No newline at end of file
+        return self.session.exec(select(User)).all()
+
+
+class AsyncUserService(UserValidationMixin):
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_by_email(self, email: str) -> User | None:
+        return (await self.session.exec(select(User).where(User.email == email))).first()
+
+    async def get_by_id(self, user_id: int) -> User | None:
+        return await self.session.get(User, user_id)
+
+    async def create_user(self, email: str, password: str) -> User:
+        if await self.get_by_email(email):
+            raise ValueError("User with this email already exists")
+
+        self.validate_email(email)
+        self._validate_password(password)
+
+        user = User(
+            email=email,
+            password=await hash_password_async(password)
+        )
+        self.session.add(user)
+        await self.session.commit()
+        await self.session.refresh(user)
+
+        return user
+
+    async def get_all_users(self) -> list[User]:
+        return (await self.session.exec(select(User))).all()
+
+    async def authenticate(self, email: str, password: str) -> User | None:
+        """
+        Проверяет пароль вне event loop. Если хеш посчитан с другой стоимостью
+        (изменился BCRYPT_ROUNDS), прозрачно перехеширует его.
+        Возвращает None, если пользователь не найден.
+        Бросает ValueError при неверном пароле.
+        """
+        user = await self.get_by_email(email)
+        if not user:
+            return None
+
+        if not await verify_password_async(password, user.password):
+            raise ValueError("Wrong password")
+
+        if needs_rehash(user.password):
+            user.password = await hash_password_async(password)
+            self.session.add(user)
+            await self.session.commit()
+            user_cache.invalidate(user.id)
+            logger.info(f"Password hash of user {user.id} upgraded to the current cost")
+
+        return user
@@ -1,3 +1,4 @@
+import json
 import requests
 from typing import Optional, Dict, List
 import streamlit as st
@@ -28,10 +29,11 @@ def login(username: str, password: str) -> Optional[str]:
         print(f"Ошибка входа: {response.status_code} {response.text}")
         return None
 
-def send_ml_task(token: str, user_id: int, input_data: str, model_name: str = "jug_recommender") -> tuple[bool, str]:
+def send_ml_task(token: str, user_id: int, input_data: str, model_name: str = "jug_recommender") -> tuple[bool, str, Optional[int]]:
     """
     Отправляет задачу на ML-воркер.
     model_name теперь всегда 'jug_recommender'
+    Возвращает (успех, сообщение, task_id).
     """
     headers = {"Authorization": f"Bearer {token}"}
     try:
@@ -46,30 +48,63 @@ def send_ml_task(token: str, user_id: int, input_data: str, model_name: str = "j
         )
 
         if response.status_code == 201:
-            return True, "Задача отправлена"
+            return True, "Задача отправлена", response.json().get("task_id")
         
         elif response.status_code == 400:
             error_detail = response.json().get("detail", "Некорректные данные")
-            return False, f"❌ Ошибка ввода: {error_detail}"
+            return False, f"❌ Ошибка ввода: {error_detail}", None
         
         elif response.status_code == 403:
-            return False, "❌ Доступ запрещён. Проверьте токен."
+            return False, "❌ Доступ запрещён. Проверьте токен.", None
         
         elif response.status_code == 404:
-            return False, "❌ Пользователь не найден."
-        
+            return False, "❌ Пользователь не найден.", None
+
+        elif response.status_code == 429:
+            # Контроль допуска: очередь перегружена или слишком много незавершённых задач
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                return False, f"⏳ Очередь занята, повторите через {retry_after} с.", None
+            return False, "⏳ Очередь занята, повторите позже.", None
+
         elif response.status_code == 500:
-            return False, "❌ Ошибка сервера при обработке запроса."
+            return False, "❌ Ошибка сервера при обработке запроса.", None
         
         else:
-            return False, f"❌ Ошибка: {response.status_code}"
+            return False, f"❌ Ошибка: {response.status_code}", None
 
     except requests.exceptions.ConnectionError:
-        return False, "Нет соединения с сервером ML."
+        return False, "Нет соединения с сервером ML.", None
     except requests.exceptions.Timeout:
-        return False, "Таймаут подключения."
+        return False, "Таймаут подключения.", None
     except Exception as e:
-        return False, f"Неизвестная ошибка: {str(e)}"
+        return False, f"Неизвестная ошибка: {str(e)}", None
+
+
+def wait_for_task(token: str, task_id: int, timeout: float = 60) -> Optional[dict]:
+    """
+    Ждёт завершения задачи по SSE-стриму /predictions/{task_id}/events.
+    Возвращает последнее состояние задачи (или None при ошибке соединения).
+    """
+    headers = {"Authorization": f"Bearer {token}", "Accept": "text/event-stream"}
+    state = None
+    try:
+        with requests.get(
+            f"{BASE_URL}/predictions/{task_id}/events",
+            headers=headers,
+            stream=True,
+            timeout=(5, timeout)
+        ) as response:
+            if response.status_code != 200:
+                return None
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("data:"):
+                    state = json.loads(line[len("data:"):])
+                    if state.get("status") in ("DONE", "FAILED") or "detail" in state:
+                        break
+    except requests.exceptions.RequestException:
+        return state
+    return state
     
 def get_predictions(token: str, user_id: int) -> List[dict]:
     """GET /predictions/all/{user_id}"""
@@ -136,13 +136,14 @@ def dashboard():
                 st.write(user_input)
             with st.chat_message("assistant"):
                 with st.spinner("🧠 Генерирую рекомендованные доклады..."):
-                    success, msg = api_client.send_ml_task(
+                    success, msg, task_id = api_client.send_ml_task(
                         token=st.session_state.token,
                         user_id=st.session_state.user_id,
                         input_data=user_input
                     )
                     if success:
-                        time.sleep(2)
+                        # Ждём события о завершении вместо фиксированной паузы
+                        api_client.wait_for_task(st.session_state.token, task_id)
                         st.rerun()
                     else:
                         st.write(msg)
@@ -0,0 +1,149 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services import admission
+from services.admission import AdmissionController, AdmissionRejected
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission, "time", SimpleNamespace(monotonic=clock))
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(admission, "USER_MAX_IN_FLIGHT", 3)
+    monkeypatch.setattr(admission, "ADMISSION_MIN_DEPTH", 10)
+    monkeypatch.setattr(admission, "ADMISSION_MAX_DEPTH", 100)
+    monkeypatch.setattr(admission, "ADMISSION_MAX_WAIT", 60)
+    return clock
+
+
+def _done(controller, task_id, user_id=1, status="DONE"):
+    controller.on_task_event({"task_id": task_id, "user_id": user_id, "status": status, "result_id": None})
+
+
+def _completions(controller, clock, count):
+    for i in range(count):
+        _done(controller, -i - 1, user_id=None)
+    clock.now += admission.RATE_WINDOW / 2
+
+
+# Резерв check() занимает места до track()/release(), лимит не обходится параллельными запросами
+def test_check_reserves_until_track_or_release(clock):
+    controller = AdmissionController()
+    first = controller.check(1, 2, depth=None)
+    assert controller.in_flight(1) == 2
+    with pytest.raises(AdmissionRejected):
+        controller.check(1, 2, depth=None)
+
+    controller.release(1, first)
+    assert controller.in_flight(1) == 0
+    reserved = controller.check(1, 3, depth=None)
+    controller.track(1, [10, 11, 12], reserved=reserved)
+    assert controller.in_flight(1) == 3
+    # Другой пользователь и bulk-лимит считаются отдельно
+    assert controller.check(2, 3, depth=None)
+    assert controller.check(1, 3, depth=None, bulk=True)
+
+
+def test_task_events_free_slots(clock):
+    controller = AdmissionController()
+    controller.track(1, [10, 11], reserved=controller.check(1, 2, depth=None))
+    _done(controller, 10)
+    _done(controller, 11, status="PROCESSING")
+    assert controller.in_flight(1) == 1
+    _done(controller, 11, status="FAILED")
+    assert controller.in_flight(1) == 0
+
+
+# Событие, пришедшее до track() с этим id, не снимает задачу: track() вызывается до публикации
+def test_event_before_track_is_lost(clock):
+    controller = AdmissionController()
+    reserved = controller.check(1, 1, depth=None)
+    _done(controller, 10)
+    controller.track(1, [10], reserved=reserved)
+    assert controller.in_flight(1) == 1
+
+
+def test_release_task_ids_after_failed_publish(clock):
+    controller = AdmissionController()
+    reserved = controller.check(1, 2, depth=None, bulk=True)
+    controller.track(1, [10, 11], bulk=True, reserved=reserved)
+    controller.release(1, [*reserved, 10, 11], bulk=True)
+    assert controller.in_flight(1, bulk=True) == 0
+
+
+def test_in_flight_expires_after_ttl(clock):
+    controller = AdmissionController()
+    controller.track(1, [10], reserved=controller.check(1, 1, depth=None))
+    clock.now += admission.IN_FLIGHT_TTL + 1
+    assert controller.in_flight(1) == 0
+
+
+def test_check_disabled(clock, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", False)
+    controller = AdmissionController()
+    assert controller.check(1, 100, depth=10**6) == []
+    assert controller.in_flight(1) == 0
+
+
+# Скорость неизвестна, пока слушатель не подключён или окно не набрано
+def test_drain_rate(clock):
+    hub = SimpleNamespace(connected=False)
+    controller = AdmissionController(hub)
+    _completions(controller, clock, 15)
+    assert controller.drain_rate() is None
+
+    hub.connected = True
+    assert controller.drain_rate() == 15 / admission.RATE_WINDOW
+    # События старше окна не учитываются
+    clock.now += admission.RATE_WINDOW
+    assert controller.drain_rate() == 0
+
+
+def test_drain_rate_waits_for_window(clock):
+    controller = AdmissionController(SimpleNamespace(connected=True))
+    assert controller.drain_rate() is None
+    clock.now += admission.RATE_WINDOW
+    assert controller.drain_rate() == 0
+    assert controller.estimated_wait(5) == float("inf")
+
+
+def test_retry_after(clock):
+    controller = AdmissionController(SimpleNamespace(connected=True))
+    assert controller._retry_after(50) == int(admission.RATE_WINDOW)
+
+    _completions(controller, clock, 30)  # 1 задача/с
+    assert controller._retry_after(50) == 50
+    assert controller._retry_after(0) == 1
+    assert controller._retry_after(10**6) == admission.MAX_RETRY_AFTER
+
+
+# Глубина очереди: по SLO, если скорость известна, иначе по жёсткому пределу
+def test_check_queue_depth(clock):
+    controller = AdmissionController(SimpleNamespace(connected=False))
+    assert controller.check(1, 1, depth=99)
+    with pytest.raises(AdmissionRejected) as e:
+        controller.check(1, 1, depth=100)
+    assert e.value.retry_after == int(admission.RATE_WINDOW)
+    assert e.value.detail["estimated_wait_s"] is None
+
+    controller = AdmissionController(SimpleNamespace(connected=True))
+    _completions(controller, clock, 30)  # 1 задача/с, SLO 60 с
+    assert controller.check(2, 1, depth=59)
+    with pytest.raises(AdmissionRejected) as e:
+        controller.check(3, 1, depth=80)
+    assert e.value.detail == {
+        "message": "ML workers are overloaded, try again later", "queue_position": 81, "estimated_wait_s": 81.0,
+    }
+    assert e.value.retry_after == 21
+    # Отказ по очереди не занимает места пользователя
+    assert controller.in_flight(3) == 0
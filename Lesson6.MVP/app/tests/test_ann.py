@@ -0,0 +1,57 @@
+import numpy as np
+
+from ml_worker.ann import IVFIndex
+from ml_worker.scoring import EmbeddingIndex, l2_normalize
+
+
+def _clustered(n=2000, dim=16, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = l2_normalize(rng.standard_normal((clusters, dim)))
+    vectors = l2_normalize(centers[rng.integers(clusters, size=n)] + 0.3 * rng.standard_normal((n, dim)))
+    queries = l2_normalize(vectors[rng.integers(n, size=50)] + 0.05 * rng.standard_normal((50, dim)))
+    return vectors.astype(np.float32), queries.astype(np.float32)
+
+
+def _recall(found, truth):
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+# Полнота IVF относительно полного перебора растёт с nprobe; все списки — точный ответ
+def test_ivf_recall_vs_brute_force():
+    vectors, queries = _clustered()
+    truth, truth_scores = EmbeddingIndex(vectors, "exact").search(queries, k=10)
+    ivf = IVFIndex.build(vectors, n_lists=32, n_iter=10)
+
+    ivf.nprobe = 8
+    assert _recall(ivf.search(queries, k=10)[0], truth) >= 0.9
+
+    ivf.nprobe = ivf.n_lists
+    idxs, scores = ivf.search(queries, k=10)
+    assert _recall(idxs, truth) == 1.0
+    np.testing.assert_allclose(scores, truth_scores, atol=1e-5)
+
+
+# Каждый вектор каталога попадает ровно в один список
+def test_ivf_lists_cover_catalog():
+    vectors, _ = _clustered(n=500)
+    ivf = IVFIndex.build(vectors, n_lists=16, n_iter=5)
+    assert ivf.offsets[0] == 0 and ivf.offsets[-1] == len(vectors)
+    assert sorted(ivf.ids.tolist()) == list(range(len(vectors)))
+
+
+# Если в nprobe списках меньше k векторов, берутся следующие списки
+def test_ivf_returns_k_results_with_small_lists():
+    vectors, queries = _clustered(n=200)
+    ivf = IVFIndex.build(vectors, n_lists=100, n_iter=5, nprobe=1)
+    idxs, _ = ivf.search(queries, k=20)
+    assert idxs.shape == (len(queries), 20)
+    assert all(len(set(row)) == 20 for row in idxs)
+
+
+def test_ivf_save_load_roundtrip(tmp_path):
+    vectors, queries = _clustered(n=300)
+    ivf = IVFIndex.build(vectors, n_lists=8, n_iter=5, build_version="v1")
+    ivf.save(tmp_path / "index.ivf")
+    loaded = IVFIndex.load(tmp_path / "index.ivf", nprobe=ivf.nprobe)
+    assert loaded.version == ivf.version
+    np.testing.assert_array_equal(loaded.search(queries, k=5)[0], ivf.search(queries, k=5)[0])
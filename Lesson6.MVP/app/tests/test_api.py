@@ -1,3 +1,4 @@
+import json
 import requests
 import time
 import uuid
@@ -43,6 +44,8 @@ def test_send_ml_task(auth_token):
     data = task_resp.json()
     assert "task_id" in data
     assert data["task_id"] > 0
+    # Позиция неизвестна (None), если брокер не ответил на запрос глубины очереди
+    assert data["queue_position"] is None or data["queue_position"] >= 1
 
 # 4. Получение истории рекомендаций
 def test_get_predictions_history(auth_token):
@@ -88,4 +91,115 @@ def test_empty_input_data(auth_token):
     )
     assert resp.status_code == 422 
     # Проверка сообщения необязательна, но можно:
-    assert "String should have at least 1 character" in str(resp.json())
\ No newline at end of file
+    assert "String should have at least 1 character" in str(resp.json())
+
+# 7. Пагинация истории рекомендаций
+def test_predictions_history_pagination(auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+
+    user_resp = requests.get(f"{BASE_URL}/users/me", headers=headers)
+    user_id = user_resp.json()["id"]
+
+    for text in ["Kotlin", "LLM"]:
+        resp = requests.post(
+            f"{BASE_URL}/ml/send_task",
+            json={"input_data": text, "model_name": "jug_recommender"},
+            headers=headers
+        )
+        assert resp.status_code == 201
+
+    page = requests.get(f"{BASE_URL}/predictions/all/{user_id}", params={"limit": 1}, headers=headers)
+    assert page.status_code == 200
+    last = page.json()
+    assert len(last) == 1
+
+    older = requests.get(
+        f"{BASE_URL}/predictions/all/{user_id}",
+        params={"limit": 50, "before_id": last[0]["id"]},
+        headers=headers
+    )
+    assert older.status_code == 200
+    assert older.json()
+    assert all(item["id"] < last[0]["id"] for item in older.json())
+
+
+# 8. Стрим статуса задачи (SSE) завершается результатом
+def test_task_events_stream(auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    task_resp = requests.post(
+        f"{BASE_URL}/ml/send_task",
+        json={"input_data": "Kotlin и корутины", "model_name": "jug_recommender"},
+        headers=headers
+    )
+    assert task_resp.status_code == 201
+    task_id = task_resp.json()["task_id"]
+
+    last_state = None
+    with requests.get(f"{BASE_URL}/predictions/{task_id}/events", headers=headers, stream=True, timeout=60) as resp:
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        for line in resp.iter_lines(decode_unicode=True):
+            if line and line.startswith("data:"):
+                last_state = json.loads(line[len("data:"):])
+                if last_state["status"] in ("DONE", "FAILED"):
+                    break
+
+    assert last_state is not None
+    assert last_state["task_id"] == task_id
+    assert last_state["status"] == "DONE"
+    assert last_state["prediction_result"]
+    assert last_state["recommendations"][0]["rank"] == 1
+
+
+# 9. Синхронная рекомендация: инлайн-ответ или постановка в очередь
+def test_recommend_endpoint(auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    resp = requests.post(
+        f"{BASE_URL}/ml/recommend",
+        json={"input_data": "архитектура микросервисов", "model_name": "jug_recommender"},
+        headers=headers
+    )
+    assert resp.status_code in (200, 202), resp.text
+    data = resp.json()
+    if resp.status_code == 200:
+        assert data["mode"] == "inline"
+        assert data["prediction_result"].startswith("1.")
+        assert len(data["recommendations"]) == 5
+        assert {"talk_id", "score", "title", "speaker", "category", "conf"} <= data["recommendations"][0].keys()
+    else:
+        assert data["mode"] == "queued"
+        assert data["task_id"] > 0
+
+
+# 10. Пакетная постановка задач: невалидные элементы возвращаются с индексом
+def test_send_tasks_bulk(auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    resp = requests.post(
+        f"{BASE_URL}/ml/send_tasks",
+        json={"tasks": [
+            {"input_data": "LLM и архитектура нейросетей"},
+            {"input_data": "   "},
+            {"input_data": "Kotlin", "model_name": "jug_hybrid"},
+            {"input_data": "Тест", "model_name": "llama3:latest"},
+        ]},
+        headers=headers
+    )
+    assert resp.status_code == 201, resp.text
+    data = resp.json()
+    assert [task["index"] for task in data["tasks"]] == [0, 2]
+    assert all(task["task_id"] > 0 for task in data["tasks"])
+    assert [error["index"] for error in data["errors"]] == [1, 3]
+    assert "Model not supported" in data["errors"][1]["detail"]
+
+
+# 11. Метрики Prometheus: время ответа по маршрутам, задачи по статусам, пулы БД
+def test_metrics_endpoint(auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    requests.get(f"{BASE_URL}/predictions/all/1", headers=headers)
+
+    resp = requests.get(f"{BASE_URL.removesuffix('/api')}/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'route="/api/predictions/all/{user_id}"' in resp.text
+    assert 'ml_tasks{status="DONE"}' in resp.text
+    assert 'db_pool_connections{pool="async",state="checked_out"}' in resp.text
@@ -0,0 +1,78 @@
+import json
+from types import SimpleNamespace
+
+from ml_worker.batching import USER_HEADER, Delivery, FairScheduler, UserRoundRobin, delivery_user
+
+
+# Сообщения одной очереди чередуются по пользователям, порядок внутри пользователя сохраняется
+def test_round_robin_alternates_users():
+    buffer = UserRoundRobin()
+    for item, user in [("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b"), ("c1", "c"), ("b2", "b")]:
+        buffer.append(item, user)
+    assert len(buffer) == 6
+    assert [buffer.pop() for _ in range(6)] == ["a1", "b1", "c1", "a2", "b2", "a3"]
+    assert len(buffer) == 0
+
+
+def test_round_robin_user_rejoins_at_end():
+    buffer = UserRoundRobin()
+    buffer.append("a1", "a")
+    buffer.append("b1", "b")
+    assert buffer.pop() == "a1"
+    buffer.append("a2", "a")
+    assert [buffer.pop(), buffer.pop()] == ["b1", "a2"]
+
+
+def _scheduler(interactive, bulk, bulk_share=0.25):
+    scheduler = FairScheduler(bulk_share)
+    for i in range(interactive):
+        scheduler.add(f"i{i}", user_id=i % 2)
+    for i in range(bulk):
+        scheduler.add(f"b{i}", user_id=100 + i % 2, bulk=True)
+    return scheduler
+
+
+# Ждущие bulk-задачи получают не меньше bulk_share батча, даже при потоке интерактивных
+def test_take_reserves_bulk_share():
+    scheduler = _scheduler(interactive=100, bulk=100)
+    batch = scheduler.take(8)
+    assert batch == ["i0", "i1", "i2", "i3", "i4", "i5", "b0", "b1"]
+    assert len(scheduler) == 200 - 8
+
+
+# Пустые слоты резерва отдаются интерактивным, и наоборот
+def test_take_fills_unused_reserve():
+    batch = _scheduler(interactive=100, bulk=1).take(8)
+    assert [item[0] for item in batch] == ["i"] * 7 + ["b"]
+
+    batch = _scheduler(interactive=2, bulk=100).take(8)
+    assert batch[:2] == ["i0", "i1"]
+    assert [item[0] for item in batch[2:]] == ["b"] * 6
+
+
+# Без ждущих интерактивных задач bulk занимает весь батч
+def test_take_bulk_only_fills_whole_batch():
+    scheduler = _scheduler(interactive=0, bulk=20)
+    assert scheduler.take(8) == [f"b{i}" for i in range(8)]
+
+
+def test_take_interactive_only():
+    assert _scheduler(interactive=3, bulk=0).take(8) == ["i0", "i1", "i2"]
+
+
+def test_take_bulk_alternates_users():
+    scheduler = FairScheduler(bulk_share=1.0)
+    for i in range(4):
+        scheduler.add(f"heavy{i}", user_id="heavy", bulk=True)
+    scheduler.add("light0", user_id="light", bulk=True)
+    assert scheduler.take(3) == ["heavy0", "light0", "heavy1"]
+
+
+def test_delivery_user_header_and_body_fallback():
+    body = json.dumps({"task_id": 1, "user_id": 7}).encode()
+    with_header = Delivery(None, SimpleNamespace(headers={USER_HEADER: 5}), body)
+    legacy = Delivery(None, SimpleNamespace(headers=None), body)
+    broken = Delivery(None, SimpleNamespace(headers=None), b"not json")
+    assert delivery_user(with_header) == 5
+    assert delivery_user(legacy) == 7
+    assert delivery_user(broken) is None
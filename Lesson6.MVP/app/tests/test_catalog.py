@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_worker.catalog import MAGIC, Catalog, append_talks, build_catalog, catalog_filename, resolve_catalog_dir
+from ml_worker.hybrid import FEATURES
+from ml_worker.scoring import l2_normalize
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Исходники каталога: dataset_processed.csv и sbert_embeddings.npy."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "title": ["Доклад про LLM", "Kotlin\nи корутины", "Без спикера", "Java 21"],
+        "speaker": ["Иван", "Anna", None, "Иван"],
+        "category": ["ML", "Kotlin", "ML", None],
+        "conf": ["Heisenbug", "Mobius", "Joker", "Joker"],
+        "companies": ["X", None, "Y", "X"],
+        "content": ["a", "b", "c", "d"],
+    })
+    df.to_csv(tmp_path / "dataset_processed.csv", index=False)
+    np.save(tmp_path / "sbert_embeddings.npy", rng.standard_normal((len(df), 8)).astype(np.float32))
+    return tmp_path
+
+
+# Артефакт JUGCAT02: запись и чтение через memory-map дают исходные данные
+def test_catalog_roundtrip(data_dir):
+    version = build_catalog(data_dir, data_dir / "catalog.bin")
+    catalog = Catalog(data_dir / "catalog.bin")
+    embeddings = np.load(data_dir / "sbert_embeddings.npy")
+
+    assert catalog.version == version
+    assert len(catalog) == 4
+    assert isinstance(catalog.embeddings, np.memmap) or isinstance(catalog.embeddings.base, np.memmap)
+    np.testing.assert_allclose(catalog.embeddings, l2_normalize(embeddings), atol=1e-6)
+    assert set(catalog.codes) == set(FEATURES)
+    assert catalog.codes["speaker"][0] == catalog.codes["speaker"][3]
+    assert catalog.codes["speaker"][2] == -1
+
+    assert catalog.line(0) == "[ML] Доклад про LLM — Иван (Heisenbug)"
+    # Пропуски в полях — None, переводы строк внутри значения сохраняются
+    assert catalog.talk(2) == {"title": "Без спикера", "speaker": None, "category": "ML", "conf": "Joker"}
+    assert catalog.talk(1)["title"] == "Kotlin\nи корутины"
+
+
+def test_catalog_render_and_describe(data_dir):
+    build_catalog(data_dir, data_dir / "catalog.bin")
+    catalog = Catalog(data_dir / "catalog.bin")
+    recommendations = [[3, 0.91], [0, 0.5]]
+
+    assert catalog.render(recommendations).split("\n")[1] == "2. [ML] Доклад про LLM — Иван (Heisenbug)"
+    described = catalog.describe(recommendations)
+    assert [item["rank"] for item in described] == [1, 2]
+    assert described[0] == {
+        "rank": 1, "talk_id": 3, "score": 0.91,
+        "title": "Java 21", "speaker": "Иван", "category": None, "conf": "Joker",
+    }
+
+
+# Версия — хеш содержимого: одинаковые исходники дают одинаковую версию
+def test_catalog_version_is_content_hash(data_dir):
+    first = build_catalog(data_dir, data_dir / "a.bin")
+    second = build_catalog(data_dir, data_dir / "b.bin")
+    assert first == second
+    np.save(data_dir / "sbert_embeddings.npy", np.ones((4, 8), dtype=np.float32))
+    assert build_catalog(data_dir, data_dir / "c.bin") != first
+
+
+# Артефакт старого формата или устаревший относительно исходников пересобирается
+def test_catalog_load_rebuilds_stale_artifact(data_dir):
+    path = data_dir / catalog_filename()
+    path.write_bytes(b"JUGCAT01" + b"\0" * 64)
+    catalog = Catalog.load(data_dir)
+    assert path.read_bytes()[:len(MAGIC)] == MAGIC
+
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+    np.save(data_dir / "sbert_embeddings.npy", np.ones((4, 8), dtype=np.float32))
+    assert Catalog.load(data_dir).version != catalog.version
+
+
+def test_catalog_rejects_foreign_file(tmp_path):
+    path = tmp_path / "catalog.bin"
+    path.write_bytes(b"not a catalog")
+    with pytest.raises(ValueError):
+        Catalog(path)
+
+
+class _FakeModel:
+    def encode(self, texts):
+        time.sleep(0.1)  # окно для гонки параллельных append
+        return np.ones((len(texts), 8), dtype=np.float32)
+
+
+# Параллельные append не выбирают одно имя версии и не теряют доклады друг друга
+def test_concurrent_append_talks(data_dir, tmp_path_factory):
+    base = pd.read_csv(data_dir / "dataset_processed.csv")
+    new_files = []
+    for i in range(3):
+        path = tmp_path_factory.mktemp("new") / "new_talks.csv"
+        row = base.iloc[[0]].assign(title=f"Новый доклад {i}")
+        row.to_csv(path, index=False)
+        new_files.append(path)
+
+    results, errors = [], []
+
+    def append(path):
+        try:
+            results.append(append_talks(data_dir, path, model=_FakeModel()))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=append, args=(path,)) for path in new_files]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert sorted(results) == ["v0001", "v0002", "v0003"]
+    current = resolve_catalog_dir(data_dir)
+    assert current.name == "v0003"
+    titles = set(pd.read_csv(current / "dataset_processed.csv")["title"])
+    assert {f"Новый доклад {i}" for i in range(3)} <= titles
+    assert len(Catalog.load(current)) == len(base) + 3
+    assert not list((data_dir / "catalogs").glob(".*.tmp"))
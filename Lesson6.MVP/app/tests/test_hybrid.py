@@ -0,0 +1,70 @@
+import numpy as np
+
+from ml_worker.hybrid import HybridScorer, encode_column
+from ml_worker.scoring import EmbeddingIndex, l2_normalize
+
+WEIGHTS = {"w_sem": 0.6, "w_cat": 0.2, "w_speaker": 0.15, "w_companies": 0.05}
+
+
+def _catalog(n=60, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = l2_normalize(rng.standard_normal((n, dim)))
+    columns = {
+        "category": [rng.choice(["ml", "java", "devops", None]) for _ in range(n)],
+        "speaker": [rng.choice(["A", "B", "C", "D", "E", None]) for _ in range(n)],
+        "companies": [rng.choice(["X", "Y", None]) for _ in range(n)],
+    }
+    return embeddings, columns, rng
+
+
+def _notebook_scores(query, embeddings, columns):
+    """Цикл по докладам, как в ноутбуке Lesson 5; пропуски ни с чем не совпадают."""
+    query = query / np.linalg.norm(query)
+    semantic = [float(np.dot(query, item)) for item in embeddings]
+    anchor = int(np.argmax(semantic))
+    scores = []
+    for i in range(len(embeddings)):
+        score = WEIGHTS["w_sem"] * semantic[i]
+        for column, weight_name in (("category", "w_cat"), ("speaker", "w_speaker"), ("companies", "w_companies")):
+            value, anchor_value = columns[column][i], columns[column][anchor]
+            if value is not None and value == anchor_value:
+                score += WEIGHTS[weight_name]
+        scores.append(score)
+    return np.array(scores)
+
+
+# Векторизованный скоринг совпадает с поэлементным циклом ноутбука
+def test_hybrid_matches_notebook_loop():
+    embeddings, columns, rng = _catalog()
+    codes = {column: encode_column(values) for column, values in columns.items()}
+    scorer = HybridScorer(EmbeddingIndex(embeddings, "test"), codes, WEIGHTS)
+    queries = rng.standard_normal((5, embeddings.shape[1])).astype(np.float32)
+
+    scores = scorer.score(queries)
+    for query, row in zip(queries, scores):
+        np.testing.assert_allclose(row, _notebook_scores(query, embeddings, columns), atol=1e-5)
+
+    idxs, top_scores = scorer.search(queries, k=5)
+    for query, row_idxs, row_scores in zip(queries, idxs, top_scores):
+        expected = _notebook_scores(query, embeddings, columns)
+        np.testing.assert_allclose(row_scores, np.sort(expected)[::-1][:5], atol=1e-5)
+        np.testing.assert_allclose(expected[row_idxs], row_scores, atol=1e-5)
+
+
+# Пересчёт по кандидатам на всю глубину каталога даёт тот же топ, что и полный скоринг
+def test_hybrid_rerank_matches_full_scoring():
+    embeddings, columns, rng = _catalog(seed=1)
+    codes = {column: encode_column(values) for column, values in columns.items()}
+    index = EmbeddingIndex(embeddings, "test")
+    queries = rng.standard_normal((4, embeddings.shape[1])).astype(np.float32)
+
+    full = HybridScorer(index, codes, WEIGHTS).search(queries, k=5)
+    reranked = HybridScorer(index, codes, WEIGHTS, rerank_depth=len(embeddings)).search(queries, k=5)
+    np.testing.assert_allclose(reranked[1], full[1], atol=1e-5)
+
+
+def test_encode_column_missing_values():
+    codes = encode_column(["a", None, "b", "a", None])
+    assert codes[0] == codes[3]
+    assert codes[0] != codes[2]
+    assert codes[1] == codes[4] == -1
@@ -0,0 +1,55 @@
+from ml_worker.result_cache import ResultCache, cache_key, normalize_query
+
+
+# Одинаковые по смыслу запросы приводятся к одному виду
+def test_normalize_query_equivalence():
+    assert normalize_query("  Люблю   LLM\tи\nJava!  ") == "люблю llm и java"
+    assert normalize_query("«Kotlin?»") == "kotlin"
+    # NFKC: полноширинные символы и лигатуры
+    assert normalize_query("ＬＬＭ") == "llm"
+    assert normalize_query("ﬁnance") == "finance"
+    # casefold, а не lower
+    assert normalize_query("STRASSE") == normalize_query("straße")
+    # Пунктуация внутри запроса сохраняется
+    assert normalize_query("c++, java.") == "c++, java"
+
+
+def test_cache_key_components():
+    key = cache_key("jug_recommender", "v1", "LLM")
+    assert key == cache_key("jug_recommender", "v1", "  llm! ")
+    assert key != cache_key("jug_recommender", "v2", "LLM")
+    assert key != cache_key("jug_hybrid", "v1", "LLM")
+
+
+def test_cache_hit_and_miss():
+    cache = ResultCache(maxsize=10, ttl=60)
+    assert cache.get("a") is None
+    cache.put("a", [[1, 0.5]])
+    assert cache.get("a") == [[1, 0.5]]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_ttl_expiry():
+    cache = ResultCache(maxsize=10, ttl=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+# Вытесняется давно не использованная запись, а не первая добавленная
+def test_cache_lru_eviction():
+    cache = ResultCache(maxsize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_cache_disabled():
+    cache = ResultCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
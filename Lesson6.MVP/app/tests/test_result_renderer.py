@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from ml_worker.catalog import Catalog, TALK_FIELDS, write_catalog
+from ml_worker.hybrid import FEATURES
+from services.result_renderer import render_result
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    n = 3
+    write_catalog(
+        tmp_path / "catalog.bin",
+        np.eye(n, 4, dtype=np.float32),
+        {column: np.zeros(n, dtype=np.int32) for column in FEATURES},
+        [f"[ML] Доклад {i} — Спикер ({i})" for i in range(n)],
+        {field: [f"{field} {i}" for i in range(n)] for field in TALK_FIELDS},
+    )
+    return Catalog(tmp_path / "catalog.bin")
+
+
+def test_render_result_with_matching_catalog(catalog):
+    result = render_result([[2, 0.9], [0, 0.5]], f"v0001-{catalog.version}", catalog=catalog)
+    assert result["prediction_result"] == "1. [ML] Доклад 2 — Спикер (2)\n2. [ML] Доклад 0 — Спикер (0)"
+    assert [item["talk_id"] for item in result["recommendations"]] == [2, 0]
+    # Версия IVF-индекса после хеша каталога не мешает проверке
+    assert render_result([[1, 0.7]], f"v0001-{catalog.version}-v0001-ivf8", catalog=catalog)["recommendations"]
+
+
+# Каталог изменился (пересобран из других исходников, версия удалена) — отдаём сохранённый текст
+@pytest.mark.parametrize("catalog_version", ["v0001-0123456789ab", "base-0123456789ab-v1-ivf8", None])
+def test_render_result_with_other_catalog_falls_back(catalog, catalog_version):
+    result = render_result([[2, 0.9]], catalog_version, "1. исходный ответ", catalog=catalog)
+    assert result == {"prediction_result": "1. исходный ответ", "recommendations": None}
+    assert render_result([[2, 0.9]], catalog_version, "", catalog=catalog)["prediction_result"] == "Ответ недоступен"
+
+
+def test_render_result_legacy_text():
+    assert render_result(None, None, "1. старый ответ") == {
+        "prediction_result": "1. старый ответ", "recommendations": None,
+    }
@@ -0,0 +1,109 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from ml_worker.batching import Delivery
+from ml_worker.retry import ERROR_HEADER, RETRY_HEADER, RetryPolicy
+
+
+class FakeChannel:
+    def __init__(self):
+        self.published = []
+        self.acked = []
+        self.declared = {}
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((routing_key, body, properties))
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def queue_declare(self, queue, durable, arguments=None):
+        self.declared[queue] = arguments
+
+
+def _delivery(queue="ml_task", retries=None, tag=1):
+    headers = {} if retries is None else {RETRY_HEADER: retries}
+    properties = SimpleNamespace(headers=headers, content_type="application/json")
+    body = json.dumps({"task_id": 7, "user_id": 1}).encode()
+    return Delivery(SimpleNamespace(delivery_tag=tag, routing_key=queue), properties, body)
+
+
+def test_delay_ms_exponential_with_cap():
+    policy = RetryPolicy(["ml_task"], max_retries=10, base_delay_ms=1000, max_delay_ms=60000)
+    assert [policy.delay_ms(retry) for retry in range(8)] == [1000, 2000, 4000, 8000, 16000, 32000, 60000, 60000]
+
+
+# Очереди задержки — по одной на каждую задержку и исходную очередь, с возвратом в неё по TTL
+def test_declare_delay_queues():
+    channel = FakeChannel()
+    RetryPolicy(["ml_task", "ml_task.bulk"], max_retries=3, base_delay_ms=100, max_delay_ms=250).declare(channel)
+    assert channel.declared["ml_task.retry.200"] == {
+        "x-message-ttl": 200, "x-dead-letter-exchange": "", "x-dead-letter-routing-key": "ml_task",
+    }
+    assert channel.declared["ml_task.bulk.retry.250"]["x-dead-letter-routing-key"] == "ml_task.bulk"
+    assert "ml_task.dlq" in channel.declared
+    assert len(channel.declared) == 2 * 3 + 1
+
+
+def test_retry_counts_headers_and_routes_to_source_queue():
+    channel = FakeChannel()
+    policy = RetryPolicy(["ml_task", "ml_task.bulk"], max_retries=5, base_delay_ms=1000)
+    delivery = _delivery("ml_task.bulk", retries=2, tag=42)
+
+    policy.retry(channel, delivery, "db down")
+
+    routing_key, body, properties = channel.published[0]
+    assert routing_key == "ml_task.bulk.retry.4000"
+    assert body == delivery.body
+    assert properties.headers[RETRY_HEADER] == 3
+    assert properties.headers[ERROR_HEADER] == "db down"
+    assert channel.acked == [42]
+    assert policy.stats() == {"retried": 1, "dead_lettered": 0}
+
+
+def test_retry_first_attempt_without_headers():
+    channel = FakeChannel()
+    policy = RetryPolicy(["ml_task"], base_delay_ms=500)
+    policy.retry(channel, _delivery(retries=None), "x" * 1000)
+    routing_key, _, properties = channel.published[0]
+    assert routing_key == "ml_task.retry.500"
+    assert properties.headers[RETRY_HEADER] == 1
+    assert len(properties.headers[ERROR_HEADER]) == 500
+
+
+# После max_retries — в DLQ и обработчик on_dead_letter (задача помечается FAILED)
+def test_dead_letter_after_max_retries():
+    channel = FakeChannel()
+    dead = []
+    policy = RetryPolicy(["ml_task"], max_retries=3, on_dead_letter=lambda delivery, reason: dead.append(reason))
+
+    policy.retry(channel, _delivery(retries=2), "still down")
+    assert channel.published[-1][0] == "ml_task.retry.4000"
+    assert not dead
+
+    policy.retry(channel, _delivery(retries=3, tag=9), "still down")
+    assert channel.published[-1][0] == "ml_task.dlq"
+    assert channel.acked[-1] == 9
+    assert dead == ["still down"]
+    assert policy.stats() == {"retried": 1, "dead_lettered": 1}
+
+
+def test_dead_letter_handler_errors_do_not_break_retry():
+    channel = FakeChannel()
+
+    def failing(delivery, reason):
+        raise RuntimeError("db down")
+
+    policy = RetryPolicy(["ml_task"], max_retries=0, on_dead_letter=failing)
+    policy.retry(channel, _delivery(), "boom")
+    assert channel.published[0][0] == "ml_task.dlq"
+    assert channel.acked == [1]
+
+
+@pytest.mark.parametrize("queue", [None, "unknown"])
+def test_retry_unknown_source_queue_uses_first(queue):
+    channel = FakeChannel()
+    RetryPolicy(["ml_task", "ml_task.bulk"], base_delay_ms=1000).retry(channel, _delivery(queue), "x")
+    assert channel.published[0][0] == "ml_task.retry.1000"
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from ml_worker.scoring import EmbeddingIndex, dequantize, l2_normalize, quantize, top_k_indices
+
+
+def _embeddings(n=200, dim=32, seed=0):
+    return l2_normalize(np.random.default_rng(seed).standard_normal((n, dim)))
+
+
+def test_quantize_float32_is_identity():
+    embeddings = _embeddings()
+    data, scales = quantize(embeddings, "float32")
+    assert scales is None
+    np.testing.assert_array_equal(data, embeddings)
+
+
+def test_quantize_float16_roundtrip():
+    embeddings = _embeddings()
+    data, scales = quantize(embeddings, "float16")
+    assert data.dtype == np.float16 and scales is None
+    np.testing.assert_allclose(dequantize(data), embeddings, atol=1e-3)
+
+
+# int8: масштаб на строку, ошибка не больше половины шага квантования
+def test_quantize_int8_roundtrip():
+    embeddings = _embeddings()
+    embeddings[0] = 0.0  # нулевая строка не даёт деления на ноль
+    data, scales = quantize(embeddings, "int8")
+    assert data.dtype == np.int8 and scales.dtype == np.float32
+    assert np.abs(data).max() <= 127
+    restored = dequantize(data, scales)
+    assert np.all(np.abs(restored - embeddings) <= scales[:, None] / 2 + 1e-6)
+    np.testing.assert_array_equal(restored[0], 0.0)
+
+
+def test_quantize_unknown_precision():
+    with pytest.raises(ValueError):
+        quantize(_embeddings(), "int4")
+
+
+# Поиск по сжатому каталогу почти совпадает с float32
+@pytest.mark.parametrize("precision, min_overlap", [("float16", 0.99), ("int8", 0.9)])
+def test_quantized_index_matches_float32(precision, min_overlap):
+    embeddings = _embeddings(n=1000)
+    queries = np.random.default_rng(1).standard_normal((20, embeddings.shape[1])).astype(np.float32)
+    exact_idxs, exact_scores = EmbeddingIndex(embeddings, "f32").search(queries, k=10)
+
+    data, scales = quantize(embeddings, precision)
+    index = EmbeddingIndex(data, precision, scales=scales, block_size=128)
+    idxs, scores = index.search(queries, k=10)
+
+    overlap = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(idxs, exact_idxs)])
+    assert overlap >= min_overlap
+    np.testing.assert_allclose(scores, exact_scores, atol=0.05)
+
+
+def test_top_k_indices_sorted():
+    scores = np.array([[0.1, 0.9, 0.3, 0.7, 0.5]])
+    np.testing.assert_array_equal(top_k_indices(scores, 3), [[1, 3, 4]])
+    np.testing.assert_array_equal(top_k_indices(scores, 10), [[1, 3, 4, 2, 0]])